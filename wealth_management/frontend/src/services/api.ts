@@ -34,6 +34,37 @@ export const portfolioApi = {
     return response.data;
   },
 
+  getSummary: async () => {
+    const response = await api.get("/portfolios/summary");
+    return response.data;
+  },
+
+  getPortfolioSummary: async (id: number) => {
+    const response = await api.get(`/portfolios/${id}/summary`);
+    return response.data;
+  },
+
+  getPortfolioHistory: async (
+    id: number,
+    params?: { from?: string; to?: string; interval?: "day" | "week" | "month" }
+  ) => {
+    const response = await api.get(`/portfolios/${id}/history`, { params });
+    return response.data;
+  },
+
+  getPortfolioPositions: async (id: number) => {
+    const response = await api.get(`/portfolios/${id}/positions`);
+    return response.data;
+  },
+
+  getPortfolioPnl: async (
+    id: number,
+    params?: { method?: "fifo" | "average"; lots?: boolean }
+  ) => {
+    const response = await api.get(`/portfolios/${id}/pnl`, { params });
+    return response.data;
+  },
+
   createPortfolio: async (data: { name: string; description?: string }) => {
     const response = await api.post("/portfolios/", data);
     return response.data;
@@ -93,6 +124,14 @@ export const assetApi = {
   },
 };
 
+type ProjectionParams = {
+  monthly_contribution?: number;
+  contribution_growth?: number;
+  expected_return?: number;
+  volatility?: number;
+  paths?: number;
+};
+
 // API methods for financial goals
 export const goalApi = {
   getAllGoals: async () => {
@@ -105,6 +144,16 @@ export const goalApi = {
     return response.data;
   },
 
+  getGoalProjection: async (id: number, params?: ProjectionParams) => {
+    const response = await api.get(`/goals/${id}/projection`, { params });
+    return response.data;
+  },
+
+  getGoalProjections: async (params?: ProjectionParams) => {
+    const response = await api.get("/goals/projections", { params });
+    return response.data;
+  },
+
   createGoal: async (data: {
     name: string;
     description?: string;
@@ -162,6 +211,7 @@ export const transactionApi = {
   createTransaction: async (data: {
     transaction_type: string;
     amount: number;
+    quantity?: number;
     asset_id?: number;
     notes?: string;
   }) => {
@@ -175,6 +225,14 @@ export const transactionApi = {
   },
 };
 
+// API methods for the dashboard
+export const dashboardApi = {
+  getDashboard: async (recent?: number) => {
+    const response = await api.get("/dashboard", { params: { recent } });
+    return response.data;
+  },
+};
+
 // API methods for user
 export const userApi = {
   getCurrentUser: async () => {
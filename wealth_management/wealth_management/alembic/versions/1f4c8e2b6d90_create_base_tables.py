@@ -0,0 +1,147 @@
+"""create base tables
+
+Revision ID: 1f4c8e2b6d90
+Revises: 8f06615a17a1
+Create Date: 2026-10-19 09:14:52.118304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f4c8e2b6d90'
+down_revision = '8f06615a17a1'
+branch_labels = None
+depends_on = None
+
+
+# The tables as the app first created them with Base.metadata.create_all;
+# later revisions add columns, indexes and tables on top. Databases created
+# that way already have them, so only missing tables are created.
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(), nullable=True),
+            sa.Column('hashed_password', sa.String(), nullable=True),
+            sa.Column('first_name', sa.String(), nullable=True),
+            sa.Column('last_name', sa.String(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if 'portfolios' not in existing:
+        op.create_table(
+            'portfolios',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_portfolios_id', 'portfolios', ['id'])
+        op.create_index('ix_portfolios_name', 'portfolios', ['name'])
+
+    if 'assets' not in existing:
+        op.create_table(
+            'assets',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('asset_type', sa.String(), nullable=True),
+            sa.Column('ticker_symbol', sa.String(), nullable=True),
+            sa.Column('quantity', sa.Float(), nullable=True),
+            sa.Column('purchase_price', sa.Float(), nullable=True),
+            sa.Column('current_price', sa.Float(), nullable=True),
+            sa.Column('purchase_date', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('portfolio_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_assets_id', 'assets', ['id'])
+        op.create_index('ix_assets_name', 'assets', ['name'])
+        op.create_index('ix_assets_asset_type', 'assets', ['asset_type'])
+
+    if 'financial_goals' not in existing:
+        op.create_table(
+            'financial_goals',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('target_amount', sa.Float(), nullable=True),
+            sa.Column('current_amount', sa.Float(), nullable=True),
+            sa.Column('target_date', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('priority', sa.String(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_financial_goals_id', 'financial_goals', ['id'])
+        op.create_index('ix_financial_goals_name', 'financial_goals', ['name'])
+
+    if 'transactions' not in existing:
+        op.create_table(
+            'transactions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('transaction_type', sa.String(), nullable=True),
+            sa.Column('amount', sa.Float(), nullable=True),
+            sa.Column('asset_id', sa.Integer(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('transaction_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(['asset_id'], ['assets.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_transactions_id', 'transactions', ['id'])
+
+    if 'subscription_plans' not in existing:
+        op.create_table(
+            'subscription_plans',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('price', sa.Float(), nullable=True),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_subscription_plans_id', 'subscription_plans', ['id'])
+        op.create_index('ix_subscription_plans_name', 'subscription_plans', ['name'], unique=True)
+
+    if 'subscription_payments' not in existing:
+        op.create_table(
+            'subscription_payments',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('plan_id', sa.Integer(), nullable=True),
+            sa.Column('payment_reference', sa.String(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.ForeignKeyConstraint(['plan_id'], ['subscription_plans.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_subscription_payments_id', 'subscription_payments', ['id'])
+        op.create_index('ix_subscription_payments_payment_reference', 'subscription_payments', ['payment_reference'], unique=True)
+
+
+def downgrade() -> None:
+    for table in ('subscription_payments', 'subscription_plans', 'transactions',
+                  'financial_goals', 'assets', 'portfolios', 'users'):
+        op.drop_table(table)
@@ -0,0 +1,49 @@
+"""add per-user access path indexes
+
+Revision ID: 3c7d2a91e4b5
+Revises: 1f4c8e2b6d90
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7d2a91e4b5'
+down_revision = '1f4c8e2b6d90'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns) matching the router queries: every list filters on
+# the owning user or portfolio and pages by id, transactions page newest first
+INDEXES = [
+    ('ix_portfolios_user_id_id', 'portfolios', ['user_id', 'id']),
+    ('ix_assets_portfolio_id_id', 'assets', ['portfolio_id', 'id']),
+    ('ix_financial_goals_user_id_id', 'financial_goals', ['user_id', 'id']),
+    ('ix_transactions_user_id_date_id', 'transactions',
+     ['user_id', sa.text('transaction_date DESC'), sa.text('id DESC')]),
+    ('ix_transactions_asset_id', 'transactions', ['asset_id']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
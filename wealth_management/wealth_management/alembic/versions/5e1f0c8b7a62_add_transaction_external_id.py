@@ -0,0 +1,40 @@
+"""add transaction external id
+
+Revision ID: 5e1f0c8b7a62
+Revises: 3c7d2a91e4b5
+Create Date: 2026-10-18 14:03:47.915260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1f0c8b7a62'
+down_revision = '3c7d2a91e4b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable column without a default: a catalog-only change
+    op.add_column('transactions', sa.Column('external_id', sa.String(), nullable=True))
+
+    # NULLs never conflict, so transactions entered by hand are unaffected
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_transactions_user_id_external_id', 'transactions', ['user_id', 'external_id'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'uq_transactions_user_id_external_id', table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('transactions', 'external_id')
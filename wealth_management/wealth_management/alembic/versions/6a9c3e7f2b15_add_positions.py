@@ -0,0 +1,43 @@
+"""add positions
+
+Revision ID: 6a9c3e7f2b15
+Revises: d2f8a4c61e93
+Create Date: 2026-10-18 22:05:13.604771
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a9c3e7f2b15'
+down_revision = 'd2f8a4c61e93'
+branch_labels = None
+depends_on = None
+
+
+# The table starts empty; fill it from the ledger afterwards with
+# `python -m scripts.rebuild_positions`
+def upgrade() -> None:
+    op.create_table(
+        'positions',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('asset_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('cost_basis', sa.Float(), nullable=False),
+        sa.Column('realized_gain', sa.Float(), nullable=False),
+        sa.Column('income', sa.Float(), nullable=False),
+        sa.Column('oversold_quantity', sa.Float(), nullable=False),
+        sa.Column('transaction_count', sa.Integer(), nullable=False),
+        sa.Column('last_transaction_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'asset_id'),
+    )
+    op.create_index('ix_positions_asset_id', 'positions', ['asset_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_positions_asset_id', table_name='positions')
+    op.drop_table('positions')
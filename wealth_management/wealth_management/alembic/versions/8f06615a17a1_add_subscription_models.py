@@ -17,15 +17,18 @@ depends_on = None
 
 
 def upgrade() -> None:
+    # The Prisma tables only exist on databases that predate this app; a
+    # fresh database has nothing to drop
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('_prisma_migrations')
-    op.drop_index('User_email_key', table_name='User')
-    op.drop_table('User')
-    op.drop_table('Asset')
-    op.drop_table('Portfolio')
-    op.drop_table('FinancialGoal')
-    op.drop_table('Transaction')
-    op.drop_table('EducationalResource')
+    if '_prisma_migrations' in existing:
+        op.drop_table('_prisma_migrations')
+    if 'User' in existing:
+        op.drop_index('User_email_key', table_name='User')
+        op.drop_table('User')
+    for table in ('Asset', 'Portfolio', 'FinancialGoal', 'Transaction', 'EducationalResource'):
+        if table in existing:
+            op.drop_table(table)
     # ### end Alembic commands ###
 
 
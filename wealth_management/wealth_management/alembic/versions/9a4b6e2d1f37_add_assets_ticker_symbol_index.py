@@ -0,0 +1,35 @@
+"""add assets ticker symbol index
+
+Revision ID: 9a4b6e2d1f37
+Revises: 5e1f0c8b7a62
+Create Date: 2026-10-18 16:21:09.338417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4b6e2d1f37'
+down_revision = '5e1f0c8b7a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Price refreshes walk distinct tickers and update by ticker
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_assets_ticker_symbol', 'assets', ['ticker_symbol'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_assets_ticker_symbol', table_name='assets',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,41 @@
+"""add portfolio snapshots
+
+Revision ID: b7e3c5a90d14
+Revises: 9a4b6e2d1f37
+Create Date: 2026-10-18 18:47:55.106392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3c5a90d14'
+down_revision = '9a4b6e2d1f37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'portfolio_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('portfolio_id', sa.Integer(), nullable=False),
+        sa.Column('snapshot_date', sa.Date(), nullable=False),
+        sa.Column('market_value', sa.Float(), nullable=False),
+        sa.Column('cost_basis', sa.Float(), nullable=False),
+        sa.Column('asset_count', sa.Integer(), nullable=False),
+        sa.Column('breakdown', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'uq_portfolio_snapshots_portfolio_id_date', 'portfolio_snapshots',
+        ['portfolio_id', 'snapshot_date'], unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_portfolio_snapshots_portfolio_id_date', table_name='portfolio_snapshots')
+    op.drop_table('portfolio_snapshots')
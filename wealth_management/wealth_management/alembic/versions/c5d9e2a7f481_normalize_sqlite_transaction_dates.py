@@ -0,0 +1,33 @@
+"""normalize sqlite transaction dates
+
+Revision ID: c5d9e2a7f481
+Revises: e4b19a7c3d58
+Create Date: 2026-10-20 10:42:18.530671
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d9e2a7f481'
+down_revision = 'e4b19a7c3d58'
+branch_labels = None
+depends_on = None
+
+
+# SQLite keeps datetimes as text. Rows dated by CURRENT_TIMESTAMP read
+# 'YYYY-MM-DD HH:MM:SS' while those written from Python carry microseconds,
+# and the two do not compare correctly, so the short ones get the missing
+# zeros. Postgres stores real timestamps and has nothing to fix.
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(sa.text(
+        "UPDATE transactions SET transaction_date = transaction_date || '.000000' "
+        "WHERE length(transaction_date) = 19"
+    ))
+
+
+def downgrade() -> None:
+    pass
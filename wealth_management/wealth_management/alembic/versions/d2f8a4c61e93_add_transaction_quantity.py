@@ -0,0 +1,25 @@
+"""add transaction quantity
+
+Revision ID: d2f8a4c61e93
+Revises: b7e3c5a90d14
+Create Date: 2026-10-18 21:12:40.318254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f8a4c61e93'
+down_revision = 'b7e3c5a90d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable column without a default: a catalog-only change
+    op.add_column('transactions', sa.Column('quantity', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('transactions', 'quantity')
@@ -0,0 +1,31 @@
+"""add data versions
+
+Revision ID: e4b19a7c3d58
+Revises: 6a9c3e7f2b15
+Create Date: 2026-10-18 23:41:37.218406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b19a7c3d58'
+down_revision = '6a9c3e7f2b15'
+branch_labels = None
+depends_on = None
+
+
+# Users without a row are at version 0 until their first write
+def upgrade() -> None:
+    op.create_table(
+        'data_versions',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('data_versions')
@@ -0,0 +1,2 @@
+# Loads .env and the settings before any app module reads its configuration
+from . import config
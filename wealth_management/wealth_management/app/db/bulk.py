@@ -0,0 +1,58 @@
+import csv
+import io
+from datetime import datetime
+from typing import Sequence
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.util import await_only
+
+# Bulk loading helpers. They take a *sync* Session so they can be used from
+# scripts directly and from the request path through `await db.run_sync(...)`,
+# which works for both the AsyncSession and the ThreadedSession.
+
+# Raw driver connection (psycopg2 or asyncpg) behind the session's transaction
+def driver_connection(session):
+    return session.connection().connection.driver_connection
+
+# INSERT construct with ON CONFLICT support for the session's database
+def dialect_insert(session):
+    return pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+# Load rows (tuples in `columns` order) into `table` inside the session's
+# current transaction. PostgreSQL uses COPY; anything else gets a single
+# executemany INSERT, which SQLAlchemy batches into multi-row VALUES.
+def copy_rows(session, table, columns: Sequence[str], rows: Sequence[tuple]) -> int:
+    if not rows:
+        return 0
+    dialect = session.get_bind().dialect
+    if dialect.name != "postgresql":
+        session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+        return len(rows)
+
+    raw = driver_connection(session)
+    if dialect.driver == "asyncpg":
+        # Called from within run_sync's greenlet, so awaiting is allowed here
+        await_only(raw.copy_records_to_table(
+            table.name, records=rows, columns=list(columns), schema_name=table.schema,
+        ))
+        return len(rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+    buffer.seek(0)
+    qualified = f"{table.schema}.{table.name}" if table.schema else table.name
+    with raw.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {qualified} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    return len(rows)
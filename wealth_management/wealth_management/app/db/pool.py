@@ -0,0 +1,122 @@
+import threading
+import time
+import weakref
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Counters for one engine's connection pool, kept up to date by pool events.
+# Gauges (checked out, idle, overflow) are read live from the pool itself.
+#
+# No pool event fires when a checkout starts waiting, so waits are measured
+# from the pool's side: while every connection it may open is lent out, any
+# further checkout blocks until the next checkin (or pool_timeout). The time
+# spent in that state, and how long connections are held per checkout, are
+# what to size the pool against.
+class PoolStats:
+    def __init__(self, limit: Optional[int]):
+        self._lock = threading.Lock()
+        # Connections the pool may lend out at once (pool_size + max_overflow),
+        # None when unbounded
+        self.limit = limit
+        self.checked_out = 0
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.hold_seconds_total = 0.0
+        self.hold_seconds_max = 0.0
+        self.exhaustions = 0
+        self.exhausted_seconds_total = 0.0
+        self._exhausted_since = None
+
+    def record_checkout(self, record):
+        now = time.perf_counter()
+        record.record_info["checked_out_at"] = now
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            if self.checked_out == self.limit:
+                self.exhaustions += 1
+                self._exhausted_since = now
+
+    def record_checkin(self, record):
+        now = time.perf_counter()
+        held = now - record.record_info.pop("checked_out_at", now)
+        with self._lock:
+            self.hold_seconds_total += held
+            self.hold_seconds_max = max(self.hold_seconds_max, held)
+            if self._exhausted_since is not None:
+                self.exhausted_seconds_total += now - self._exhausted_since
+                self._exhausted_since = None
+            self.checked_out -= 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    # Exhausted time including the current stretch, if the pool is exhausted now
+    def exhausted_seconds(self) -> float:
+        with self._lock:
+            if self._exhausted_since is None:
+                return self.exhausted_seconds_total
+            return self.exhausted_seconds_total + time.perf_counter() - self._exhausted_since
+
+_stats = weakref.WeakKeyDictionary()
+
+# Start counting for an engine's pool. Listeners on a pool carry over when
+# Engine.dispose() recreates it, so they are attached once per engine.
+def instrument(engine, limit: Optional[int]) -> PoolStats:
+    if engine in _stats:
+        return _stats[engine]
+    stats = _stats[engine] = PoolStats(limit)
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        stats.record_checkout(record)
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, record):
+        stats.record_checkin(record)
+
+    @event.listens_for(pool, "connect")
+    def _connect(dbapi_connection, record):
+        stats.record_connect()
+
+    @event.listens_for(pool, "invalidate")
+    def _invalidate(dbapi_connection, record, exception):
+        stats.record_invalidation()
+
+    return stats
+
+# Point-in-time view of an engine's pool for the internal endpoint
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    status = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "timeout_seconds": pool.timeout(),
+    }
+    stats = _stats.get(engine)
+    if stats is not None:
+        status.update({
+            "max_overflow": stats.limit - pool.size() if stats.limit is not None else -1,
+            "checkouts": stats.checkouts,
+            "connects": stats.connects,
+            "invalidations": stats.invalidations,
+            "hold_seconds_total": round(stats.hold_seconds_total, 6),
+            "hold_seconds_max": round(stats.hold_seconds_max, 6),
+            "hold_seconds_avg": round(stats.hold_seconds_total / stats.checkouts, 6) if stats.checkouts else 0.0,
+            "exhaustions": stats.exhaustions,
+            "exhausted_seconds_total": round(stats.exhausted_seconds(), 6),
+        })
+    return status
@@ -0,0 +1,146 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# Adds an X-DB-Statements header to every response; for development and
+# scripts.statement_budget, not for production
+DB_COUNT_STATEMENTS = os.getenv("DB_COUNT_STATEMENTS", "false").lower() in ("1", "true", "yes")
+# Server-Timing header with the request's database, JWT, bcrypt and
+# serialization time, readable in the browser's network panel
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+# Statements slower than this are logged, with their parameters redacted;
+# 0 turns the log off
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Log requests that send one statement more than this many times, the mark
+# of an N+1 query; 0 turns the check off
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "0"))
+# Whether RequestStatsMiddleware has anything to do
+REQUEST_STATS = DB_COUNT_STATEMENTS or SERVER_TIMING or N_PLUS_ONE_THRESHOLD > 0
+
+STATEMENTS_HEADER = "X-DB-Statements"
+
+# What one request spent: statements sent and their time, per statement
+# text when the N+1 check is on, and named sections recorded with timed()
+class RequestStats:
+    __slots__ = ("count", "db_seconds", "shapes", "timings")
+
+    def __init__(self, track_shapes: bool = False):
+        self.count = 0
+        self.db_seconds = 0.0
+        self.shapes: Optional[Dict[str, int]] = {} if track_shapes else None
+        self.timings: Dict[str, float] = {}
+
+    # Server-Timing value; durations in milliseconds
+    def server_timing(self, total_seconds: float) -> str:
+        metrics = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.count} statements"']
+        metrics += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items()]
+        metrics.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(metrics)
+
+    # Statements sent more than `threshold` times, with their counts
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        return {shape: count for shape, count in (self.shapes or {}).items() if count > threshold}
+
+_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+# Record the statements sent to the database within the block. The stats
+# live in a context variable, which SQLAlchemy's async greenlets and the
+# threadpool both inherit, so every engine and session mode is covered.
+@contextmanager
+def request_stats(track_shapes: bool = False) -> Iterator[RequestStats]:
+    stats = RequestStats(track_shapes)
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
+
+# Add the block's wall time to the current request's `name` timing; does
+# nothing outside a request
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    stats = _stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.timings[name] = stats.timings.get(name, 0.0) + time.perf_counter() - started
+
+# Parameter types only: values may be emails, password hashes or amounts
+def _redact(parameters, executemany: bool) -> str:
+    if executemany:
+        return f"<{len(parameters)} rows>"
+    if isinstance(parameters, dict):
+        return repr({name: type(value).__name__ for name, value in parameters.items()})
+    return repr(tuple(type(value).__name__ for value in parameters or ()))
+
+# Both listen on the Engine class, so the sync engine and the async
+# engine's underlying sync engine are covered. The start time rides on the
+# execution context, which a failed statement simply drops.
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats.get()
+    if stats is not None:
+        stats.count += 1
+        if stats.shapes is not None:
+            stats.shapes[statement] = stats.shapes.get(statement, 0) + 1
+    if context is not None:
+        context._statement_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_statement_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _stats.get()
+    if stats is not None:
+        stats.db_seconds += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "slow query (%.1f ms): %s parameters=%s",
+            elapsed * 1000, " ".join(statement.split()), _redact(parameters, executemany),
+        )
+
+# ASGI middleware recording each request's stats. Headers are written when
+# the response starts; the N+1 check runs once the request is done.
+class RequestStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with request_stats(track_shapes=N_PLUS_ONE_THRESHOLD > 0) as stats:
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    if SERVER_TIMING:
+                        headers.append((b"server-timing", stats.server_timing(time.perf_counter() - started).encode()))
+                    if DB_COUNT_STATEMENTS:
+                        headers.append((STATEMENTS_HEADER.lower().encode(), str(stats.count).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                for shape, count in stats.repeated(N_PLUS_ONE_THRESHOLD).items():
+                    logger.warning(
+                        "possible N+1: %s %s sent this statement %d times: %s",
+                        scope["method"], scope["path"], count, " ".join(shape.split()),
+                    )
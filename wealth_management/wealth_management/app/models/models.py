@@ -1,8 +1,13 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Text, Table
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, Boolean, Column, Date, ForeignKey, Index, Integer, JSON, String, Float, DateTime, Text, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..db.database import Base
 
+# Current time for columns stamped from Python
+def utcnow():
+    return datetime.now(timezone.utc)
+
 # User model
 class User(Base):
     __tablename__ = "users"
@@ -34,6 +39,28 @@ class Portfolio(Base):
     # Relationships
     owner = relationship("User", back_populates="portfolios")
     assets = relationship("Asset", back_populates="portfolio")
+    snapshots = relationship("PortfolioSnapshot", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_portfolios_user_id_id", "user_id", "id"),
+    )
+
+# Daily portfolio valuation, written only on days the portfolio changed
+class PortfolioSnapshot(Base):
+    __tablename__ = "portfolio_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id", ondelete="CASCADE"), nullable=False)
+    snapshot_date = Column(Date, nullable=False)
+    market_value = Column(Float, nullable=False)
+    cost_basis = Column(Float, nullable=False)
+    asset_count = Column(Integer, nullable=False)
+    breakdown = Column(JSON, nullable=False)  # {asset_type: {market_value, cost_basis, asset_count}}
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("uq_portfolio_snapshots_portfolio_id_date", "portfolio_id", "snapshot_date", unique=True),
+    )
 
 # Asset model
 class Asset(Base):
@@ -54,6 +81,11 @@ class Asset(Base):
     # Relationships
     portfolio = relationship("Portfolio", back_populates="assets")
 
+    __table_args__ = (
+        Index("ix_assets_portfolio_id_id", "portfolio_id", "id"),
+        Index("ix_assets_ticker_symbol", "ticker_symbol"),
+    )
+
 # Financial Goal model
 class FinancialGoal(Base):
     __tablename__ = "financial_goals"
@@ -72,6 +104,10 @@ class FinancialGoal(Base):
     # Relationships
     user = relationship("User", back_populates="financial_goals")
 
+    __table_args__ = (
+        Index("ix_financial_goals_user_id_id", "user_id", "id"),
+    )
+
 # Transaction model
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -79,16 +115,55 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     transaction_type = Column(String)  # buy, sell, dividend, deposit, withdrawal
     amount = Column(Float)
+    quantity = Column(Float, nullable=True)  # units bought or sold; amount is the total
     asset_id = Column(Integer, ForeignKey("assets.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    transaction_date = Column(DateTime(timezone=True), server_default=func.now())
+    # Stamped from Python so every row stores one format: SQLite's
+    # CURRENT_TIMESTAMP text has no fractional seconds, which breaks the
+    # comparisons of the keyset cursor (see app.services.pagination)
+    transaction_date = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     notes = Column(Text, nullable=True)
+    external_id = Column(String, nullable=True)  # custodian / feed reference, unique per user
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     user = relationship("User")
     asset = relationship("Asset")
 
+    __table_args__ = (
+        Index("ix_transactions_user_id_date_id", "user_id", transaction_date.desc(), id.desc()),
+        Index("ix_transactions_asset_id", "asset_id"),
+        Index("uq_transactions_user_id_external_id", "user_id", "external_id", unique=True),
+    )
+
+# Current holding of one asset, maintained from the transaction ledger at
+# average cost (see app/services/positions.py)
+class Position(Base):
+    __tablename__ = "positions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    asset_id = Column(Integer, ForeignKey("assets.id", ondelete="CASCADE"), primary_key=True)
+    quantity = Column(Float, nullable=False, default=0.0)
+    cost_basis = Column(Float, nullable=False, default=0.0)
+    realized_gain = Column(Float, nullable=False, default=0.0)
+    income = Column(Float, nullable=False, default=0.0)
+    oversold_quantity = Column(Float, nullable=False, default=0.0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    last_transaction_date = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_positions_asset_id", "asset_id"),
+    )
+
+# Counter bumped by every write to a user's portfolios, assets, goals or
+# transactions; list and detail responses derive their ETag from it
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
 # Subscription Plan model
 class SubscriptionPlan(Base):
     __tablename__ = "subscription_plans"
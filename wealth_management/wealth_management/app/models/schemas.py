@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import date, datetime
 
 # User schemas
 class UserBase(BaseModel):
@@ -26,6 +26,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
 
 # Portfolio schemas
 class PortfolioBase(BaseModel):
@@ -43,6 +44,112 @@ class PortfolioResponse(PortfolioBase):
     class Config:
         orm_mode = True
 
+# Portfolio summary schemas
+class AssetAllocation(BaseModel):
+    asset_type: str
+    asset_count: int
+    market_value: float
+    cost_basis: float
+    unrealized_gain: float
+    weight: float
+
+class PortfolioSummaryResponse(BaseModel):
+    portfolio_id: Optional[int] = None
+    asset_count: int
+    market_value: float
+    cost_basis: float
+    unrealized_gain: float
+    allocation: List[AssetAllocation]
+
+class PortfoliosSummaryResponse(PortfolioSummaryResponse):
+    portfolios: List[PortfolioSummaryResponse]
+
+class SnapshotBreakdown(BaseModel):
+    market_value: float
+    cost_basis: float
+    asset_count: int
+
+class PortfolioHistoryPoint(BaseModel):
+    date: date
+    market_value: float
+    cost_basis: float
+    breakdown: Dict[str, SnapshotBreakdown]
+
+class PortfolioHistoryResponse(BaseModel):
+    portfolio_id: int
+    interval: str
+    points: List[PortfolioHistoryPoint]
+
+# Open lot of a position; under average cost every lot carries the average
+class PnlLot(BaseModel):
+    transaction_id: int
+    date: datetime
+    quantity: float
+    unit_cost: float
+    cost_basis: float
+
+class PnlPosition(BaseModel):
+    asset_id: int
+    name: Optional[str] = None
+    ticker_symbol: Optional[str] = None
+    quantity: float
+    cost_basis: float
+    market_value: float
+    realized_gain: float
+    unrealized_gain: float
+    income: float
+    total_gain: float
+    oversold_quantity: float
+    lots: List[PnlLot]
+
+class PortfolioPnlResponse(BaseModel):
+    portfolio_id: int
+    method: str
+    transactions: int
+    skipped: int
+    cost_basis: float
+    market_value: float
+    realized_gain: float
+    unrealized_gain: float
+    income: float
+    total_gain: float
+    positions: List[PnlPosition]
+
+# Stored position at average cost, kept current with every transaction
+class PositionResponse(BaseModel):
+    asset_id: int
+    name: Optional[str] = None
+    ticker_symbol: Optional[str] = None
+    current_price: Optional[float] = None
+    quantity: float
+    cost_basis: float
+    average_cost: Optional[float] = None
+    market_value: float
+    unrealized_gain: float
+    realized_gain: float
+    income: float
+    transaction_count: int
+    last_transaction_date: Optional[datetime] = None
+
+class RollingReturn(BaseModel):
+    latest: Optional[float] = None
+    best: Optional[float] = None
+    worst: Optional[float] = None
+
+# Ratios are annualized; any metric needing more history than exists is null
+class PortfolioMetricsResponse(BaseModel):
+    portfolio_id: int
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    observations: int
+    total_return: Optional[float] = None
+    annualized_return: Optional[float] = None
+    volatility: Optional[float] = None
+    sharpe_ratio: Optional[float] = None
+    sortino_ratio: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    rolling_returns: Dict[str, RollingReturn]
+
 # Asset schemas
 class AssetBase(BaseModel):
     name: str
@@ -64,6 +171,17 @@ class AssetResponse(AssetBase):
     class Config:
         orm_mode = True
 
+# Bulk import schemas
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResponse(BaseModel):
+    imported: int
+    duplicates: int = 0
+    failed: int
+    errors: List[ImportRowError]
+
 # Financial Goal schemas
 class FinancialGoalBase(BaseModel):
     name: str
@@ -84,24 +202,75 @@ class FinancialGoalResponse(FinancialGoalBase):
     class Config:
         orm_mode = True
 
+# Percentiles of the simulated balance on one date
+class ProjectionBand(BaseModel):
+    date: date
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+
+# Bands run yearly from today, the last one at the final whole month before
+# the target date
+class GoalProjectionResponse(BaseModel):
+    goal_id: int
+    target_amount: float
+    months: int
+    paths: int
+    success_probability: float
+    bands: List[ProjectionBand]
+
 # Transaction schemas
 class TransactionBase(BaseModel):
     transaction_type: str
     amount: float
+    quantity: Optional[float] = None
     asset_id: Optional[int] = None
     notes: Optional[str] = None
 
 class TransactionCreate(TransactionBase):
     pass
 
+class TransactionIngestRow(TransactionBase):
+    external_id: str
+    transaction_date: Optional[datetime] = None
+
 class TransactionResponse(TransactionBase):
     id: int
     user_id: int
     transaction_date: datetime
+    external_id: Optional[str] = None
     
     class Config:
         orm_mode = True
 
+# Dashboard schemas
+class DashboardPortfolio(PortfolioSummaryResponse):
+    name: str
+
+class GoalProgress(BaseModel):
+    id: int
+    name: str
+    target_amount: float
+    current_amount: float
+    target_date: Optional[datetime] = None
+    priority: Optional[str] = None
+    progress: float
+    remaining_amount: float
+
+# Combined book, per-portfolio summaries, goals by target date and the most
+# recent transactions, newest first
+class DashboardResponse(BaseModel):
+    asset_count: int
+    market_value: float
+    cost_basis: float
+    unrealized_gain: float
+    allocation: List[AssetAllocation]
+    portfolios: List[DashboardPortfolio]
+    goals: List[GoalProgress]
+    recent_transactions: List[TransactionResponse]
+
 # Subscription Plan schemas
 class SubscriptionPlanBase(BaseModel):
     name: str
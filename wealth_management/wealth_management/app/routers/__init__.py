@@ -3,4 +3,7 @@ from .users import router as users_router
 from .portfolios import router as portfolios_router
 from .assets import router as assets_router
 from .goals import router as goals_router
-from .transactions import router as transactions_router 
\ No newline at end of file
+from .transactions import router as transactions_router
+from .internal import router as internal_router
+from .dashboard import router as dashboard_router
+from .metrics import router as metrics_router
\ No newline at end of file
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
 from ..db.database import get_db
-from ..models.models import User, Asset, Portfolio
+from ..models.models import Asset, Portfolio
 from ..models.schemas import AssetCreate, AssetResponse
 from ..services.auth import get_current_active_user
+from ..services.data_versions import bump_version, conditional_get
+from ..services.export import export_format, export_response
+from ..services.pagination import after_id, paginate
+from ..services.responses import lean_response, response_columns
+from ..services.token_cache import CurrentUser
+from ..services.writes import insert_owned, owned_portfolio
 
 router = APIRouter(
     prefix="/assets",
@@ -12,125 +20,145 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=AssetResponse, status_code=status.HTTP_201_CREATED)
-def create_asset(
+async def create_asset(
     asset: AssetCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    # Verify portfolio belongs to user
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == asset.portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
-    
-    if not portfolio:
+    # Inserted only if the portfolio belongs to the user
+    db_asset = (await db.execute(
+        insert_owned(Asset, "portfolio_id", owned_portfolio(asset.portfolio_id, current_user.id),
+                     asset.model_dump(exclude={"portfolio_id"}))
+        .returning(*response_columns(Asset, AssetResponse))
+    )).first()
+
+    if db_asset is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Portfolio not found or doesn't belong to the user"
         )
-    
-    db_asset = Asset(
-        name=asset.name,
-        asset_type=asset.asset_type,
-        ticker_symbol=asset.ticker_symbol,
-        quantity=asset.quantity,
-        purchase_price=asset.purchase_price,
-        current_price=asset.current_price,
-        purchase_date=asset.purchase_date,
-        portfolio_id=asset.portfolio_id
-    )
-    db.add(db_asset)
-    db.commit()
-    db.refresh(db_asset)
+
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
     return db_asset
 
-@router.get("/", response_model=List[AssetResponse])
-def read_assets(
+@router.get("/", response_model=List[AssetResponse], dependencies=[Depends(conditional_get)])
+async def read_assets(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     portfolio_id: int = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     # Base query with user's portfolios
-    query = db.query(Asset).join(Portfolio).filter(Portfolio.user_id == current_user.id)
-    
+    query = select(*response_columns(Asset, AssetResponse)).join(Portfolio).where(Portfolio.user_id == current_user.id)
+
     # Filter by portfolio if provided
     if portfolio_id:
-        query = query.filter(Asset.portfolio_id == portfolio_id)
-    
-    assets = query.offset(skip).limit(limit).all()
-    return assets
+        query = query.where(Asset.portfolio_id == portfolio_id)
+
+    # Resume after the last row of the previous page
+    if cursor:
+        query = query.where(after_id(Asset.id, cursor))
+
+    assets = await db.execute(query.order_by(Asset.id).offset(skip).limit(limit + 1))
+    return lean_response(paginate(assets, limit, response, "id"), response)
 
-@router.get("/{asset_id}", response_model=AssetResponse)
-def read_asset(
+@router.get("/export")
+async def export_assets(
+    format: str = "csv",
+    portfolio_id: int = None,
+    asset_type: str = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    # Holdings across the user's portfolios; the date range applies to purchase_date
+    fmt = export_format(format)
+    query = select(
+        Asset.id, Asset.portfolio_id, Asset.name, Asset.asset_type, Asset.ticker_symbol,
+        Asset.quantity, Asset.purchase_price, Asset.current_price, Asset.purchase_date,
+    ).join(Portfolio).where(Portfolio.user_id == current_user.id)
+
+    if portfolio_id:
+        query = query.where(Asset.portfolio_id == portfolio_id)
+    if asset_type:
+        query = query.where(Asset.asset_type == asset_type)
+    if start_date:
+        query = query.where(Asset.purchase_date >= start_date)
+    if end_date:
+        query = query.where(Asset.purchase_date <= end_date)
+
+    return await export_response(query.order_by(Asset.id), fmt, "assets", db)
+
+@router.get("/{asset_id}", response_model=AssetResponse, dependencies=[Depends(conditional_get)])
+async def read_asset(
     asset_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    asset = db.query(Asset).join(Portfolio).filter(
+    asset = await db.scalar(select(Asset).join(Portfolio).where(
         Asset.id == asset_id,
         Portfolio.user_id == current_user.id
-    ).first()
-    
+    ))
+
     if asset is None:
         raise HTTPException(status_code=404, detail="Asset not found")
     return asset
 
 @router.put("/{asset_id}", response_model=AssetResponse)
-def update_asset(
+async def update_asset(
     asset_id: int,
     asset: AssetCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    # Verify portfolio belongs to user
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == asset.portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
-    
-    if not portfolio:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Portfolio not found or doesn't belong to the user"
+    # Updated only if both the asset's current portfolio and the one it is
+    # moved to belong to the user
+    db_asset = (await db.execute(
+        update(Asset)
+        .where(
+            Asset.id == asset_id,
+            Asset.portfolio_id.in_(select(Portfolio.id).where(Portfolio.user_id == current_user.id)),
+            owned_portfolio(asset.portfolio_id, current_user.id).exists(),
         )
-    
-    db_asset = db.query(Asset).join(Portfolio).filter(
-        Asset.id == asset_id,
-        Portfolio.user_id == current_user.id
-    ).first()
-    
+        .values(**asset.model_dump())
+        .returning(*response_columns(Asset, AssetResponse))
+        .execution_options(synchronize_session=False)
+    )).first()
+
     if db_asset is None:
+        # Nothing was written; find out which check failed
+        if await db.scalar(owned_portfolio(asset.portfolio_id, current_user.id)) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Portfolio not found or doesn't belong to the user"
+            )
         raise HTTPException(status_code=404, detail="Asset not found")
-    
-    db_asset.name = asset.name
-    db_asset.asset_type = asset.asset_type
-    db_asset.ticker_symbol = asset.ticker_symbol
-    db_asset.quantity = asset.quantity
-    db_asset.purchase_price = asset.purchase_price
-    db_asset.current_price = asset.current_price
-    db_asset.purchase_date = asset.purchase_date
-    db_asset.portfolio_id = asset.portfolio_id
-    
-    db.commit()
-    db.refresh(db_asset)
+
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
     return db_asset
 
 @router.delete("/{asset_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_asset(
+async def delete_asset(
     asset_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_asset = db.query(Asset).join(Portfolio).filter(
-        Asset.id == asset_id,
-        Portfolio.user_id == current_user.id
-    ).first()
-    
-    if db_asset is None:
+    deleted = await db.scalar(
+        delete(Asset)
+        .where(Asset.id == asset_id, Asset.portfolio_id.in_(select(Portfolio.id).where(Portfolio.user_id == current_user.id)))
+        .returning(Asset.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Asset not found")
-    
-    db.delete(db_asset)
-    db.commit()
-    return None 
\ No newline at end of file
+
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
+    return None
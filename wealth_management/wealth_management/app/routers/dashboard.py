@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.database import get_db
+from ..models.schemas import DashboardResponse
+from ..services.auth import get_current_active_user
+from ..services.dashboard import load_dashboard
+from ..services.data_versions import conditional_get
+from ..services.token_cache import CurrentUser
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["dashboard"],
+)
+
+# Portfolio summaries, allocation by asset type, goal progress and the most
+# recent transactions in one response, read with a single statement
+@router.get("", response_model=DashboardResponse, dependencies=[Depends(conditional_get)])
+async def read_dashboard(
+    recent: int = Query(10, ge=0, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    return await db.run_sync(load_dashboard, current_user.id, recent)
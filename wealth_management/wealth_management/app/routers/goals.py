@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import delete, insert, select, update
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from ..db.database import get_db
-from ..models.models import User, FinancialGoal
-from ..models.schemas import FinancialGoalCreate, FinancialGoalResponse
+from ..models.models import FinancialGoal
+from ..models.schemas import FinancialGoalCreate, FinancialGoalResponse, GoalProjectionResponse
 from ..services.auth import get_current_active_user
+from ..services.data_versions import bump_version, conditional_get
+from ..services.pagination import after_id, paginate
+from ..services.projections import PROJECTION_EXPECTED_RETURN, PROJECTION_MAX_PATHS, PROJECTION_PATHS, PROJECTION_VOLATILITY, Assumptions, GoalInputs, project_goals
+from ..services.responses import lean_response, response_columns
+from ..services.token_cache import CurrentUser
 
 router = APIRouter(
     prefix="/goals",
@@ -12,111 +20,143 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=FinancialGoalResponse, status_code=status.HTTP_201_CREATED)
-def create_goal(
+async def create_goal(
     goal: FinancialGoalCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_goal = FinancialGoal(
-        name=goal.name,
-        description=goal.description,
-        target_amount=goal.target_amount,
-        current_amount=goal.current_amount,
-        target_date=goal.target_date,
-        priority=goal.priority,
-        user_id=current_user.id
-    )
-    db.add(db_goal)
-    db.commit()
-    db.refresh(db_goal)
+    db_goal = (await db.execute(
+        insert(FinancialGoal)
+        .values(**goal.model_dump(), user_id=current_user.id)
+        .returning(*response_columns(FinancialGoal, FinancialGoalResponse))
+    )).one()
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
     return db_goal
 
-@router.get("/", response_model=List[FinancialGoalResponse])
-def read_goals(
+@router.get("/", response_model=List[FinancialGoalResponse], dependencies=[Depends(conditional_get)])
+async def read_goals(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    query = select(*response_columns(FinancialGoal, FinancialGoalResponse)).where(FinancialGoal.user_id == current_user.id)
+    if cursor:
+        query = query.where(after_id(FinancialGoal.id, cursor))
+    goals = await db.execute(query.order_by(FinancialGoal.id).offset(skip).limit(limit + 1))
+    return lean_response(paginate(goals, limit, response, "id"), response)
+
+# Query parameters shared by the projection endpoints
+def projection_assumptions(
+    monthly_contribution: float = Query(0.0, ge=0),
+    contribution_growth: float = Query(0.0, ge=-1, le=1),
+    expected_return: float = Query(PROJECTION_EXPECTED_RETURN, gt=-1, le=1),
+    volatility: float = Query(PROJECTION_VOLATILITY, ge=0, le=2),
+    paths: int = Query(PROJECTION_PATHS, ge=100, le=PROJECTION_MAX_PATHS),
+) -> Assumptions:
+    return Assumptions(expected_return, volatility, monthly_contribution, contribution_growth, paths)
+
+@router.get("/projections", response_model=List[GoalProjectionResponse])
+async def read_goals_projections(
+    assumptions: Assumptions = Depends(projection_assumptions),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    goals = db.query(FinancialGoal).filter(FinancialGoal.user_id == current_user.id).offset(skip).limit(limit).all()
-    return goals
+    # Monte Carlo projection of every goal under the same assumptions
+    goals = await db.scalars(
+        select(FinancialGoal).where(FinancialGoal.user_id == current_user.id).order_by(FinancialGoal.id)
+    )
+    today = date.today()
+    inputs = [GoalInputs.from_goal(goal, today) for goal in goals]
+    return await run_in_threadpool(project_goals, inputs, assumptions, today)
 
-@router.get("/{goal_id}", response_model=FinancialGoalResponse)
-def read_goal(
+@router.get("/{goal_id}/projection", response_model=GoalProjectionResponse)
+async def read_goal_projection(
     goal_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    assumptions: Assumptions = Depends(projection_assumptions),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    goal = db.query(FinancialGoal).filter(
+    goal = await db.scalar(select(FinancialGoal).where(
         FinancialGoal.id == goal_id,
         FinancialGoal.user_id == current_user.id
-    ).first()
-    
+    ))
+
     if goal is None:
         raise HTTPException(status_code=404, detail="Financial goal not found")
-    return goal
+    today = date.today()
+    return (await run_in_threadpool(project_goals, [GoalInputs.from_goal(goal, today)], assumptions, today))[0]
 
-@router.put("/{goal_id}", response_model=FinancialGoalResponse)
-def update_goal(
+@router.get("/{goal_id}", response_model=FinancialGoalResponse, dependencies=[Depends(conditional_get)])
+async def read_goal(
     goal_id: int,
-    goal: FinancialGoalCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_goal = db.query(FinancialGoal).filter(
+    goal = await db.scalar(select(FinancialGoal).where(
         FinancialGoal.id == goal_id,
         FinancialGoal.user_id == current_user.id
-    ).first()
-    
+    ))
+
+    if goal is None:
+        raise HTTPException(status_code=404, detail="Financial goal not found")
+    return goal
+
+# Update the user's goal in one statement, returning the response columns;
+# 404 if there is no such goal
+async def _update_goal(db, goal_id: int, user_id: int, values: dict):
+    db_goal = (await db.execute(
+        update(FinancialGoal)
+        .where(FinancialGoal.id == goal_id, FinancialGoal.user_id == user_id)
+        .values(**values)
+        .returning(*response_columns(FinancialGoal, FinancialGoalResponse))
+        .execution_options(synchronize_session=False)
+    )).first()
+
     if db_goal is None:
         raise HTTPException(status_code=404, detail="Financial goal not found")
-    
-    db_goal.name = goal.name
-    db_goal.description = goal.description
-    db_goal.target_amount = goal.target_amount
-    db_goal.current_amount = goal.current_amount
-    db_goal.target_date = goal.target_date
-    db_goal.priority = goal.priority
-    
-    db.commit()
-    db.refresh(db_goal)
+
+    await db.run_sync(bump_version, user_id)
+    await db.commit()
     return db_goal
 
+@router.put("/{goal_id}", response_model=FinancialGoalResponse)
+async def update_goal(
+    goal_id: int,
+    goal: FinancialGoalCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    return await _update_goal(db, goal_id, current_user.id, goal.model_dump())
+
 @router.patch("/{goal_id}/progress", response_model=FinancialGoalResponse)
-def update_goal_progress(
+async def update_goal_progress(
     goal_id: int,
     current_amount: float,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_goal = db.query(FinancialGoal).filter(
-        FinancialGoal.id == goal_id,
-        FinancialGoal.user_id == current_user.id
-    ).first()
-    
-    if db_goal is None:
-        raise HTTPException(status_code=404, detail="Financial goal not found")
-    
-    db_goal.current_amount = current_amount
-    
-    db.commit()
-    db.refresh(db_goal)
-    return db_goal
+    return await _update_goal(db, goal_id, current_user.id, {"current_amount": current_amount})
 
 @router.delete("/{goal_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_goal(
+async def delete_goal(
     goal_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_goal = db.query(FinancialGoal).filter(
-        FinancialGoal.id == goal_id,
-        FinancialGoal.user_id == current_user.id
-    ).first()
-    
-    if db_goal is None:
+    deleted = await db.scalar(
+        delete(FinancialGoal)
+        .where(FinancialGoal.id == goal_id, FinancialGoal.user_id == current_user.id)
+        .returning(FinancialGoal.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Financial goal not found")
-    
-    db.delete(db_goal)
-    db.commit()
-    return None 
\ No newline at end of file
+
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
+    return None
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from ..db.database import engine, async_engine
+from ..db.pool import pool_status
+from ..services.auth import get_current_admin_user
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["internal"],
+    dependencies=[Depends(get_current_admin_user)],
+)
+
+# Connection pool usage for sizing workers against Postgres max_connections
+@router.get("/db-pool")
+async def read_db_pool():
+    status = {"sync": pool_status(engine)}
+    if async_engine is not None:
+        status["async"] = pool_status(async_engine.sync_engine)
+    return status
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Response
+from starlette.concurrency import run_in_threadpool
+from ..services.metrics import render_metrics
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+# Prometheus scrape target. Rendering reads every worker's files in
+# multiprocess mode, so it runs off the event loop.
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    body, content_type = await run_in_threadpool(render_metrics)
+    return Response(content=body, headers={"Content-Type": content_type})
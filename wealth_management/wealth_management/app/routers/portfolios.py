@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..db.database import get_db
-from ..models.models import User, Portfolio
-from ..models.schemas import PortfolioCreate, PortfolioResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from datetime import date
+from ..db.database import get_db, stream_partitions
+from ..models.models import Asset, Portfolio
+from ..models.schemas import ImportResponse, PortfolioCreate, PortfolioHistoryResponse, PortfolioMetricsResponse, PortfolioPnlResponse, PortfolioResponse, PositionResponse, PortfolioSummaryResponse, PortfoliosSummaryResponse
+from ..services.analytics import RISK_FREE_RATE, group_series, portfolio_metrics, series_query
+from ..services.asset_import import import_assets
 from ..services.auth import get_current_active_user
+from ..services.data_versions import bump_version, conditional_get
+from ..services.pagination import after_id, paginate
+from ..services.pnl import PNL_BATCH_SIZE, PNL_METHODS, PnlEngine, ledger_query, positions_assets_query
+from ..services.positions import holding, holdings_query
+from ..services.records import aparse_records, detect_format
+from ..services.responses import lean_response, response_columns
+from ..services.snapshots import INTERVALS, downsample, history_query
+from ..services.token_cache import CurrentUser
+from ..services.valuation import allocation_query, summarize, summarize_all
+from ..services.writes import owned_portfolio
 
 router = APIRouter(
     prefix="/portfolios",
@@ -12,70 +27,214 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=PortfolioResponse, status_code=status.HTTP_201_CREATED)
-def create_portfolio(
+async def create_portfolio(
     portfolio: PortfolioCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_portfolio = Portfolio(
-        name=portfolio.name,
-        description=portfolio.description,
-        user_id=current_user.id
-    )
-    db.add(db_portfolio)
-    db.commit()
-    db.refresh(db_portfolio)
+    db_portfolio = (await db.execute(
+        insert(Portfolio)
+        .values(name=portfolio.name, description=portfolio.description, user_id=current_user.id)
+        .returning(*response_columns(Portfolio, PortfolioResponse))
+    )).one()
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
     return db_portfolio
 
-@router.get("/", response_model=List[PortfolioResponse])
-def read_portfolios(
+@router.get("/", response_model=List[PortfolioResponse], dependencies=[Depends(conditional_get)])
+async def read_portfolios(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    query = select(*response_columns(Portfolio, PortfolioResponse)).where(Portfolio.user_id == current_user.id)
+    if cursor:
+        query = query.where(after_id(Portfolio.id, cursor))
+    portfolios = await db.execute(query.order_by(Portfolio.id).offset(skip).limit(limit + 1))
+    return lean_response(paginate(portfolios, limit, response, "id"), response)
+
+@router.get("/summary", response_model=PortfoliosSummaryResponse)
+async def read_portfolios_summary(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    rows = (await db.execute(allocation_query(current_user.id))).all()
+    return summarize_all(rows)
+
+@router.get("/metrics", response_model=List[PortfolioMetricsResponse])
+async def read_portfolios_metrics(
+    portfolio_id: Optional[List[int]] = Query(None),
+    risk_free_rate: float = RISK_FREE_RATE,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    # Risk and performance metrics for all (or the listed) portfolios in one pass
+    rows = (await db.execute(series_query(current_user.id, portfolio_id))).all()
+    series = list(group_series(rows).values())
+    return await run_in_threadpool(portfolio_metrics, series, risk_free_rate)
+
+@router.get("/{portfolio_id}/metrics", response_model=PortfolioMetricsResponse)
+async def read_portfolio_metrics(
+    portfolio_id: int,
+    risk_free_rate: float = RISK_FREE_RATE,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    rows = (await db.execute(series_query(current_user.id, [portfolio_id]))).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    series = list(group_series(rows).values())
+    return (await run_in_threadpool(portfolio_metrics, series, risk_free_rate))[0]
+
+@router.get("/{portfolio_id}/summary", response_model=PortfolioSummaryResponse)
+async def read_portfolio_summary(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    rows = (await db.execute(allocation_query(current_user.id, portfolio_id=portfolio_id))).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    return summarize(rows, portfolio_id=portfolio_id)
+
+@router.get("/{portfolio_id}/history", response_model=PortfolioHistoryResponse)
+async def read_portfolio_history(
+    portfolio_id: int,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    interval: str = "day",
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    # Valuation over time from the daily snapshots, one point per interval
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(INTERVALS)}")
+    end = end or date.today()
+    if start is not None and start > end:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+
+    portfolio = await db.scalar(select(Portfolio.id).where(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id))
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+
+    snapshots = await db.scalars(history_query(portfolio_id, start, end))
+    return {
+        "portfolio_id": portfolio_id,
+        "interval": interval,
+        "points": downsample(snapshots, start, end, interval),
+    }
+
+@router.get("/{portfolio_id}/positions", response_model=List[PositionResponse])
+async def read_portfolio_positions(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    portfolios = db.query(Portfolio).filter(Portfolio.user_id == current_user.id).offset(skip).limit(limit).all()
-    return portfolios
+    # Current holdings from the positions table, whatever the ledger length
+    portfolio = await db.scalar(select(Portfolio.id).where(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id))
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    rows = await db.execute(holdings_query(current_user.id, portfolio_id))
+    return [holding(row) for row in rows]
 
-@router.get("/{portfolio_id}", response_model=PortfolioResponse)
-def read_portfolio(
+@router.get("/{portfolio_id}/pnl", response_model=PortfolioPnlResponse)
+async def read_portfolio_pnl(
     portfolio_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    method: str = "fifo",
+    lots: bool = True,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id).first()
+    # Realized and unrealized gains, income and open lots, replayed from the
+    # transaction ledger as it streams in; lots=false leaves out the lots
+    if method not in PNL_METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {', '.join(PNL_METHODS)}")
+
+    portfolio = await db.scalar(select(Portfolio.id).where(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id))
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+
+    engine = PnlEngine(method)
+    async for rows in stream_partitions(ledger_query(current_user.id, portfolio_id), PNL_BATCH_SIZE, mappings=False, db=db):
+        await run_in_threadpool(engine.replay, rows)
+    assets = {}
+    if engine.positions:
+        assets = {row.id: row for row in await db.execute(positions_assets_query(engine.positions))}
+    return engine.report(portfolio_id, assets, lots)
+
+@router.get("/{portfolio_id}", response_model=PortfolioResponse, dependencies=[Depends(conditional_get)])
+async def read_portfolio(
+    portfolio_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    portfolio = await db.scalar(select(Portfolio).where(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id))
     if portfolio is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     return portfolio
 
+@router.post("/{portfolio_id}/assets:import", response_model=ImportResponse)
+async def import_portfolio_assets(
+    portfolio_id: int,
+    request: Request,
+    format: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    # Streamed CSV or JSON Lines body, one asset per row
+    fmt = detect_format(request.headers.get("content-type"), format)
+
+    # Verify portfolio belongs to user, once for the whole file
+    portfolio = await db.scalar(select(Portfolio.id).where(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id))
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+
+    return await import_assets(db, current_user.id, portfolio_id, aparse_records(request.stream(), fmt))
+
 @router.put("/{portfolio_id}", response_model=PortfolioResponse)
-def update_portfolio(
+async def update_portfolio(
     portfolio_id: int,
     portfolio: PortfolioCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id).first()
+    db_portfolio = (await db.execute(
+        update(Portfolio)
+        .where(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id)
+        .values(name=portfolio.name, description=portfolio.description)
+        .returning(*response_columns(Portfolio, PortfolioResponse))
+        .execution_options(synchronize_session=False)
+    )).first()
     if db_portfolio is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    
-    db_portfolio.name = portfolio.name
-    db_portfolio.description = portfolio.description
-    
-    db.commit()
-    db.refresh(db_portfolio)
+
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
     return db_portfolio
 
 @router.delete("/{portfolio_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_portfolio(
+async def delete_portfolio(
     portfolio_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_portfolio = db.query(Portfolio).filter(Portfolio.id == portfolio_id, Portfolio.user_id == current_user.id).first()
-    if db_portfolio is None:
+    owned = owned_portfolio(portfolio_id, current_user.id)
+    # Assets outlive their portfolio, unassigned, as they did when the ORM
+    # deleted it
+    await db.execute(
+        update(Asset).where(Asset.portfolio_id.in_(owned)).values(portfolio_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = await db.scalar(
+        delete(Portfolio).where(Portfolio.id.in_(owned)).returning(Portfolio.id)
+        .execution_options(synchronize_session=False)
+    )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    
-    db.delete(db_portfolio)
-    db.commit()
-    return None 
\ No newline at end of file
+
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
+    return None
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import os
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models import models, schemas
 from ..db.database import get_db
+from ..services.responses import response_columns
+from ..services.writes import insert_owned
 from typing import List
 from fastapi.security import OAuth2PasswordBearer
 
+# Configuration
+# Plans change only with a release, so browsers and proxies may reuse them
+PLANS_CACHE_SECONDS = int(os.getenv("PLANS_CACHE_SECONDS", "3600"))
+
 router = APIRouter(
     prefix="/subscriptions",
     tags=["subscriptions"]
@@ -18,23 +26,24 @@ def get_current_user_id(token: str = Depends(oauth2_scheme)):
     return 1  # Dummy user_id for now
 
 @router.get("/plans", response_model=List[schemas.SubscriptionPlanResponse])
-def get_plans(db: Session = Depends(get_db)):
-    return db.query(models.SubscriptionPlan).all()
+async def get_plans(response: Response, db: AsyncSession = Depends(get_db)):
+    plans = await db.scalars(select(models.SubscriptionPlan))
+    response.headers["Cache-Control"] = f"public, max-age={PLANS_CACHE_SECONDS}"
+    return plans.all()
 
 @router.post("/payment", response_model=schemas.SubscriptionPaymentResponse)
-def submit_payment(payment: schemas.SubscriptionPaymentCreate, db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
-    # Check if plan exists
-    plan = db.query(models.SubscriptionPlan).filter(models.SubscriptionPlan.id == payment.plan_id).first()
-    if not plan:
+async def submit_payment(payment: schemas.SubscriptionPaymentCreate, db: AsyncSession = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+    # Inserted only if the plan exists
+    plan = select(models.SubscriptionPlan.id).where(models.SubscriptionPlan.id == payment.plan_id)
+    db_payment = (await db.execute(
+        insert_owned(models.SubscriptionPayment, "plan_id", plan, {
+            "user_id": user_id,
+            "payment_reference": payment.payment_reference,
+            "status": "pending",
+        })
+        .returning(*response_columns(models.SubscriptionPayment, schemas.SubscriptionPaymentResponse))
+    )).first()
+    if db_payment is None:
         raise HTTPException(status_code=404, detail="Subscription plan not found")
-    # Create payment record
-    db_payment = models.SubscriptionPayment(
-        user_id=user_id,
-        plan_id=payment.plan_id,
-        payment_reference=payment.payment_reference,
-        status="pending"
-    )
-    db.add(db_payment)
-    db.commit()
-    db.refresh(db_payment)
-    return db_payment 
\ No newline at end of file
+    await db.commit()
+    return db_payment
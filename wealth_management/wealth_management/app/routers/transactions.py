@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
 from ..db.database import get_db
-from ..models.models import User, Transaction, Asset, Portfolio
-from ..models.schemas import TransactionCreate, TransactionResponse
+from ..models.models import Transaction, Asset, Portfolio
+from ..models.schemas import ImportResponse, TransactionCreate, TransactionResponse
 from ..services.auth import get_current_active_user
+from ..services.data_versions import bump_version, conditional_get
+from ..services.export import export_format, export_response
+from ..services.pagination import after_desc, paginate
+from ..services.positions import apply_transaction, remove_transaction
+from ..services.records import aparse_records, detect_format
+from ..services.responses import lean_response, response_columns
+from ..services.token_cache import CurrentUser
+from ..services.transaction_ingest import TransactionIngestor
+from ..services.writes import insert_owned
 
 router = APIRouter(
     prefix="/transactions",
@@ -12,91 +23,163 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=TransactionResponse, status_code=status.HTTP_201_CREATED)
-def create_transaction(
+async def create_transaction(
     transaction: TransactionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    # If transaction has an asset_id, verify it belongs to the user
+    values = transaction.model_dump(exclude={"asset_id"})
     if transaction.asset_id:
-        asset = db.query(Asset).join(Portfolio).filter(
+        # Inserted only if the asset belongs to the user
+        owner = select(Asset.id).join(Portfolio).where(
             Asset.id == transaction.asset_id,
             Portfolio.user_id == current_user.id
-        ).first()
-        
-        if not asset:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Asset not found or doesn't belong to the user"
-            )
-    
-    db_transaction = Transaction(
-        transaction_type=transaction.transaction_type,
-        amount=transaction.amount,
-        asset_id=transaction.asset_id,
-        notes=transaction.notes,
-        user_id=current_user.id
-    )
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+        )
+        statement = insert_owned(Transaction, "asset_id", owner, {**values, "user_id": current_user.id})
+    else:
+        statement = insert(Transaction).values(**values, user_id=current_user.id)
+
+    db_transaction = (await db.execute(
+        statement.returning(*response_columns(Transaction, TransactionResponse))
+    )).first()
+    if db_transaction is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Asset not found or doesn't belong to the user"
+        )
+
+    # The position moves in the same database transaction as the ledger
+    await db.run_sync(apply_transaction, db_transaction)
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
     return db_transaction
 
-@router.get("/", response_model=List[TransactionResponse])
-def read_transactions(
+@router.post("/ingest", response_model=ImportResponse)
+async def ingest_transactions(
+    request: Request,
+    format: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    # Streamed CSV or JSON Lines feed, one transaction per row, each with an
+    # external_id. Batches are committed as they load, so a failed upload can
+    # simply be sent again: rows already stored are counted as duplicates.
+    fmt = detect_format(request.headers.get("content-type"), format)
+    ingestor = TransactionIngestor(current_user.id)
+
+    async for row, record, error in aparse_records(request.stream(), fmt):
+        batch = ingestor.add(row, record, error)
+        if batch:
+            await db.run_sync(ingestor.load_batch, batch)
+            await db.commit()
+
+    await db.run_sync(ingestor.load_batch, ingestor.drain())
+    await db.commit()
+    await db.run_sync(ingestor.finish)
+    await db.commit()
+    return ingestor.report.as_dict()
+
+@router.get("/", response_model=List[TransactionResponse], dependencies=[Depends(conditional_get)])
+async def read_transactions(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     asset_id: int = None,
     transaction_type: str = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     # Base query with user's transactions
-    query = db.query(Transaction).filter(Transaction.user_id == current_user.id)
-    
+    query = select(*response_columns(Transaction, TransactionResponse)).where(Transaction.user_id == current_user.id)
+
     # Filter by asset if provided
     if asset_id:
-        query = query.filter(Transaction.asset_id == asset_id)
-    
+        query = query.where(Transaction.asset_id == asset_id)
+
     # Filter by transaction type if provided
     if transaction_type:
-        query = query.filter(Transaction.transaction_type == transaction_type)
-    
-    # Order by transaction date descending
-    query = query.order_by(Transaction.transaction_date.desc())
-    
-    transactions = query.offset(skip).limit(limit).all()
-    return transactions
-
-@router.get("/{transaction_id}", response_model=TransactionResponse)
-def read_transaction(
+        query = query.where(Transaction.transaction_type == transaction_type)
+
+    # Filter by date range if provided
+    if start_date:
+        query = query.where(Transaction.transaction_date >= start_date)
+    if end_date:
+        query = query.where(Transaction.transaction_date <= end_date)
+
+    # Resume after the last row of the previous page
+    if cursor:
+        query = query.where(after_desc(Transaction.transaction_date, Transaction.id, cursor))
+
+    # Order by transaction date descending, id breaking ties so the cursor is exact
+    query = query.order_by(Transaction.transaction_date.desc(), Transaction.id.desc())
+
+    transactions = await db.execute(query.offset(skip).limit(limit + 1))
+    return lean_response(paginate(transactions, limit, response, "transaction_date", "id"), response)
+
+@router.get("/export")
+async def export_transactions(
+    format: str = "csv",
+    asset_id: int = None,
+    transaction_type: str = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    # Full history, oldest first, in the same columns POST /transactions/ingest reads
+    fmt = export_format(format)
+    query = select(
+        Transaction.external_id, Transaction.transaction_type, Transaction.amount,
+        Transaction.quantity, Transaction.asset_id, Transaction.transaction_date, Transaction.notes, Transaction.id,
+    ).where(Transaction.user_id == current_user.id)
+
+    if asset_id:
+        query = query.where(Transaction.asset_id == asset_id)
+    if transaction_type:
+        query = query.where(Transaction.transaction_type == transaction_type)
+    if start_date:
+        query = query.where(Transaction.transaction_date >= start_date)
+    if end_date:
+        query = query.where(Transaction.transaction_date <= end_date)
+
+    query = query.order_by(Transaction.transaction_date, Transaction.id)
+    return await export_response(query, fmt, "transactions", db)
+
+@router.get("/{transaction_id}", response_model=TransactionResponse, dependencies=[Depends(conditional_get)])
+async def read_transaction(
     transaction_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    transaction = db.query(Transaction).filter(
+    transaction = await db.scalar(select(Transaction).where(
         Transaction.id == transaction_id,
         Transaction.user_id == current_user.id
-    ).first()
-    
+    ))
+
     if transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return transaction
 
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_transaction(
+async def delete_transaction(
     transaction_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    db_transaction = db.query(Transaction).filter(
-        Transaction.id == transaction_id,
-        Transaction.user_id == current_user.id
-    ).first()
-    
+    db_transaction = (await db.execute(
+        delete(Transaction)
+        .where(Transaction.id == transaction_id, Transaction.user_id == current_user.id)
+        .returning(*response_columns(Transaction, TransactionResponse))
+        .execution_options(synchronize_session=False)
+    )).first()
+
     if db_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    db.delete(db_transaction)
-    db.commit()
-    return None 
\ No newline at end of file
+
+    await db.run_sync(remove_transaction, db_transaction)
+    await db.run_sync(bump_version, current_user.id)
+    await db.commit()
+    return None
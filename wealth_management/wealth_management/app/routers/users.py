@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from ..db.database import get_db
 from ..models.models import User
 from ..models.schemas import UserCreate, UserResponse
-from ..services.auth import get_password_hash, get_current_active_user
+from ..services.auth import get_current_active_user
+from ..services.passwords import password_hasher
+from ..services.responses import response_columns
+from ..services.token_cache import CurrentUser, token_cache
 
 router = APIRouter(
     prefix="/users",
@@ -12,44 +17,60 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    hashed_password = await password_hasher.hash(user.password)
+    # The unique email index is the existence check
+    try:
+        db_user = (await db.execute(
+            insert(User)
+            .values(
+                email=user.email,
+                hashed_password=hashed_password,
+                first_name=user.first_name,
+                last_name=user.last_name
+            )
+            .returning(*response_columns(User, UserResponse))
+        )).one()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
-    # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        hashed_password=hashed_password,
-        first_name=user.first_name,
-        last_name=user.last_name
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
     return db_user
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_active_user)):
-    return current_user
+async def read_users_me(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    return await db.get(User, current_user.id)
 
 @router.put("/me", response_model=UserResponse)
-def update_user_me(
+async def update_user_me(
     first_name: str = None,
     last_name: str = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
+    values = {}
     if first_name:
-        current_user.first_name = first_name
+        values["first_name"] = first_name
     if last_name:
-        current_user.last_name = last_name
-    
-    db.commit()
-    db.refresh(current_user)
-    return current_user 
\ No newline at end of file
+        values["last_name"] = last_name
+    if not values:
+        return await db.get(User, current_user.id)
+
+    db_user = (await db.execute(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(**values)
+        .returning(*response_columns(User, UserResponse))
+        .execution_options(synchronize_session=False)
+    )).one()
+    await db.commit()
+    # A Core update skips the ORM hook in services.auth, so this user's
+    # cached tokens are dropped here
+    token_cache.invalidate_user(current_user.id)
+    return db_user
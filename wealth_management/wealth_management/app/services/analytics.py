@@ -0,0 +1,203 @@
+import os
+import warnings
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select
+from ..models.models import Portfolio, PortfolioSnapshot
+from .cache import TTLCache
+
+# numpy is imported inside the functions using it, keeping its import time
+# out of application startup
+
+# Configuration
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.0"))
+METRICS_CACHE_SIZE = int(os.getenv("METRICS_CACHE_SIZE", "10000"))
+
+# Snapshots are daily, calendar days included, and quiet days are filled
+# forward, so a year is 365 observations
+PERIODS_PER_YEAR = 365
+ROLLING_WINDOWS = {"30d": 30, "90d": 90, "365d": 365}
+
+# Every snapshot of the user's portfolios, oldest first per portfolio, in one
+# query. Portfolios without snapshots still come back once with NULL values.
+def series_query(user_id: int, portfolio_ids: Optional[Iterable[int]] = None):
+    query = (
+        select(
+            Portfolio.id.label("portfolio_id"),
+            PortfolioSnapshot.snapshot_date,
+            PortfolioSnapshot.market_value,
+            PortfolioSnapshot.cost_basis,
+        )
+        .select_from(Portfolio)
+        .outerjoin(PortfolioSnapshot, PortfolioSnapshot.portfolio_id == Portfolio.id)
+        .where(Portfolio.user_id == user_id)
+        .order_by(Portfolio.id, PortfolioSnapshot.snapshot_date)
+    )
+    if portfolio_ids is not None:
+        query = query.where(Portfolio.id.in_(list(portfolio_ids)))
+    return query
+
+# One portfolio's snapshots as arrays
+class Series:
+    def __init__(self, portfolio_id: int):
+        self.portfolio_id = portfolio_id
+        self.dates: List[date] = []
+        self.market_value: List[float] = []
+        self.cost_basis: List[float] = []
+
+    # The data itself is the version: any new or rewritten snapshot changes it
+    def version(self) -> int:
+        return hash((tuple(self.dates), tuple(self.market_value), tuple(self.cost_basis)))
+
+def group_series(rows: Iterable) -> Dict[int, Series]:
+    series: Dict[int, Series] = {}
+    for row in rows:
+        entry = series.get(row.portfolio_id)
+        if entry is None:
+            entry = series[row.portfolio_id] = Series(row.portfolio_id)
+        if row.snapshot_date is not None:
+            entry.dates.append(row.snapshot_date)
+            entry.market_value.append(row.market_value)
+            entry.cost_basis.append(row.cost_basis)
+    return series
+
+# Lay the series out on one daily grid (portfolios x days) ending at `as_of`,
+# so a portfolio's metrics never depend on which others share the batch.
+# Snapshots are only written on change, so each series is filled forward from
+# its first snapshot; days before it stay NaN.
+def _daily_grid(series: List[Series], as_of: date):
+    import numpy as np
+    start = min(s.dates[0] for s in series).toordinal()
+    shape = (len(series), as_of.toordinal() - start + 1)
+    market_value = np.full(shape, np.nan)
+    cost_basis = np.full(shape, np.nan)
+    for row, s in enumerate(series):
+        days = np.fromiter((d.toordinal() - start for d in s.dates), dtype=np.int64, count=len(s.dates))
+        kept = days < shape[1]
+        market_value[row, days[kept]] = np.asarray(s.market_value)[kept]
+        cost_basis[row, days[kept]] = np.asarray(s.cost_basis)[kept]
+
+    # Forward fill: index of the last observed day at or before each day
+    observed = np.where(~np.isnan(market_value), np.arange(shape[1]), 0)
+    np.maximum.accumulate(observed, axis=1, out=observed)
+    rows = np.arange(shape[0])[:, None]
+    return market_value[rows, observed], cost_basis[rows, observed]
+
+# Daily returns net of contributions. Money put in or taken out shows up as a
+# change in cost basis, so it is removed from the day's gain before dividing
+# by the previous day's value (end-of-day cash flows).
+def _daily_returns(market_value, cost_basis):
+    import numpy as np
+    flows = np.diff(cost_basis, axis=1)
+    previous = market_value[:, :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = (market_value[:, 1:] - flows) / previous - 1.0
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+def _none_if_nan(values) -> list:
+    import numpy as np
+    return [None if np.isnan(value) else float(value) for value in values]
+
+# All metrics for a batch of series at once; each array op covers every
+# portfolio in the batch
+def compute_metrics(series: List[Series], as_of: date, risk_free_rate: float = RISK_FREE_RATE) -> List[dict]:
+    import numpy as np
+    results = {s.portfolio_id: _empty_metrics(s) for s in series}
+    with_history = [s for s in series if s.dates and s.dates[0] <= as_of]
+    if not with_history:
+        return [results[s.portfolio_id] for s in series]
+    market_value, cost_basis = _daily_grid(with_history, as_of)
+    if market_value.shape[1] < 2:
+        return [results[s.portfolio_id] for s in series]
+
+    # All-NaN rows (too little history) legitimately produce NaN, which is
+    # reported as null; numpy's warnings about them are just noise
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        returns = _daily_returns(market_value, cost_basis)
+        observations = np.sum(~np.isnan(returns), axis=1)
+        has_returns = observations > 0
+
+        wealth = np.cumprod(np.nan_to_num(returns, nan=0.0) + 1.0, axis=1)
+        total_return = np.where(has_returns, wealth[:, -1] - 1.0, np.nan)
+        annualized_return = (1.0 + total_return) ** (PERIODS_PER_YEAR / np.maximum(observations, 1)) - 1.0
+
+        excess = returns - risk_free_rate / PERIODS_PER_YEAR
+        mean_excess = np.nanmean(excess, axis=1)
+        daily_volatility = np.nanstd(returns, axis=1, ddof=1)
+        downside = np.sqrt(np.nanmean(np.minimum(excess, 0.0) ** 2, axis=1))
+        volatility = daily_volatility * np.sqrt(PERIODS_PER_YEAR)
+        sharpe = np.where(daily_volatility > 0, mean_excess / daily_volatility * np.sqrt(PERIODS_PER_YEAR), np.nan)
+        sortino = np.where(downside > 0, mean_excess / downside * np.sqrt(PERIODS_PER_YEAR), np.nan)
+
+        max_drawdown = np.where(has_returns, np.min(wealth / np.maximum.accumulate(wealth, axis=1) - 1.0, axis=1), np.nan)
+
+        # Trailing window returns from the wealth index, starting from the
+        # 1.0 before the first return; NaN where the window reaches back
+        # before the portfolio's history
+        index = np.hstack([np.ones((len(with_history), 1)), wealth])
+        seen = np.hstack([np.zeros((len(with_history), 1)), np.cumsum(~np.isnan(returns), axis=1)])
+        rolling = {}
+        for name, window in ROLLING_WINDOWS.items():
+            if index.shape[1] <= window:
+                rolling[name] = np.full((len(with_history), 3), np.nan)
+                continue
+            window_returns = index[:, window:] / index[:, :-window] - 1.0
+            window_returns[seen[:, window:] - seen[:, :-window] < window] = np.nan
+            rolling[name] = np.stack([
+                window_returns[:, -1],
+                np.nanmax(window_returns, axis=1),
+                np.nanmin(window_returns, axis=1),
+            ], axis=1)
+
+    columns = {
+        "total_return": _none_if_nan(total_return),
+        "annualized_return": _none_if_nan(annualized_return),
+        "volatility": _none_if_nan(volatility),
+        "sharpe_ratio": _none_if_nan(sharpe),
+        "sortino_ratio": _none_if_nan(sortino),
+        "max_drawdown": _none_if_nan(max_drawdown),
+    }
+    for row, s in enumerate(with_history):
+        metrics = results[s.portfolio_id]
+        metrics["observations"] = int(observations[row])
+        for name, values in columns.items():
+            metrics[name] = values[row]
+        metrics["rolling_returns"] = {
+            name: dict(zip(("latest", "best", "worst"), _none_if_nan(values[row])))
+            for name, values in rolling.items()
+        }
+    return [results[s.portfolio_id] for s in series]
+
+def _empty_metrics(series: Series) -> dict:
+    return {
+        "portfolio_id": series.portfolio_id,
+        "start_date": series.dates[0] if series.dates else None,
+        "end_date": series.dates[-1] if series.dates else None,
+        "observations": 0,
+        "total_return": None,
+        "annualized_return": None,
+        "volatility": None,
+        "sharpe_ratio": None,
+        "sortino_ratio": None,
+        "max_drawdown": None,
+        "rolling_returns": {name: {"latest": None, "best": None, "worst": None} for name in ROLLING_WINDOWS},
+    }
+
+# Bounded LRU of computed metrics keyed by (portfolio, data version, as-of
+# date, rate)
+metrics_cache = TTLCache(METRICS_CACHE_SIZE)
+
+# Metrics for every series, computing only the ones not already cached for
+# this exact data, all misses in one vectorized batch
+def portfolio_metrics(series: List[Series], risk_free_rate: float = RISK_FREE_RATE, as_of: Optional[date] = None) -> List[dict]:
+    as_of = as_of or date.today()
+    keys = {s.portfolio_id: (s.portfolio_id, s.version(), as_of, risk_free_rate) for s in series}
+    cached = {s.portfolio_id: metrics_cache.get(keys[s.portfolio_id]) for s in series}
+    misses = [s for s in series if cached[s.portfolio_id] is None]
+    for metrics in compute_metrics(misses, as_of, risk_free_rate) if misses else []:
+        metrics_cache.set(keys[metrics["portfolio_id"]], metrics)
+        cached[metrics["portfolio_id"]] = metrics
+    return [cached[s.portfolio_id] for s in series]
@@ -0,0 +1,45 @@
+import os
+from typing import AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.bulk import copy_rows
+from ..models.models import Asset
+from ..models.schemas import AssetCreate
+from .data_versions import bump_version
+from .records import ImportReport, ParsedRow, describe_validation_error
+
+# Configuration
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+ASSET_COLUMNS = (
+    "name", "asset_type", "ticker_symbol", "quantity",
+    "purchase_price", "current_price", "purchase_date", "portfolio_id",
+)
+
+# Validate parsed rows against AssetCreate and load the valid ones into the
+# portfolio in batches, all inside the session's single transaction. The
+# caller must already have checked that the portfolio belongs to user_id.
+async def import_assets(db: AsyncSession, user_id: int, portfolio_id: int, rows: AsyncIterator[ParsedRow]) -> dict:
+    report = ImportReport()
+    batch = []
+
+    async for row, record, error in rows:
+        if error is None:
+            try:
+                asset = AssetCreate.model_validate({**record, "portfolio_id": portfolio_id})
+            except ValidationError as exc:
+                error = describe_validation_error(exc)
+        if error is not None:
+            report.add_error(row, error)
+            continue
+
+        batch.append(tuple(getattr(asset, column) for column in ASSET_COLUMNS))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            report.imported += await db.run_sync(copy_rows, Asset.__table__, ASSET_COLUMNS, batch)
+            batch = []
+
+    report.imported += await db.run_sync(copy_rows, Asset.__table__, ASSET_COLUMNS, batch)
+    if report.imported:
+        await db.run_sync(bump_version, user_id)
+    await db.commit()
+    return report.as_dict()
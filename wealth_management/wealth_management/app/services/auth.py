@@ -2,45 +2,51 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import env_list
 from ..db.database import get_db
+from ..db.statements import timed
 from ..models.models import User
 from ..models.schemas import TokenData
-from dotenv import load_dotenv
-
-load_dotenv()
+from .passwords import password_hasher
+from .token_cache import CurrentUser, token_cache
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_for_jwt_here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Comma-separated emails allowed on the /internal endpoints; none by default
+ADMIN_EMAILS = frozenset(email.lower() for email in env_list("ADMIN_EMAILS", ""))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Password verification
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Password verification, off the event loop
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-# Password hashing
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# Password hashing, off the event loop
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 # Get user by email
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
 
 # Authenticate user
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return False
+    # Rehash on login when BCRYPT_ROUNDS changed since the hash was stored
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 # Create access token
@@ -54,28 +60,57 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Get the lightweight user record for a token's claims. Tokens carry the
+# user id, so this is a primary-key lookup; older tokens fall back to email.
+async def get_user_record(db: AsyncSession, token_data: TokenData):
+    columns = select(User.id, User.email, User.is_active)
+    if token_data.user_id is not None:
+        row = (await db.execute(columns.where(User.id == token_data.user_id))).first()
+        if row is not None and row.email != token_data.email:
+            row = None
+    else:
+        row = (await db.execute(columns.where(User.email == token_data.email))).first()
+    return CurrentUser(*row) if row is not None else None
+
 # Get current user
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with timed("jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
-    user = get_user_by_email(db, email=token_data.email)
+    user = await get_user_record(db, token_data)
     if user is None:
         raise credentials_exception
+    token_cache.set(token, user, exp=payload["exp"])
     return user
 
 # Get current active user
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: CurrentUser = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
+
+# Get current user, who must be listed in ADMIN_EMAILS
+async def get_current_admin_user(current_user: CurrentUser = Depends(get_current_active_user)):
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return current_user
+
+# Drop cached tokens whenever a user row changes (profile edits, deactivation)
+@event.listens_for(User, "after_update")
+def _invalidate_cached_user(mapper, connection, target):
+    token_cache.invalidate_user(target.id)
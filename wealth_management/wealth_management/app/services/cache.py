@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Thread-safe bounded LRU shared by the per-worker caches (tokens, metrics,
+# projections). Entries expire after `ttl` seconds, or at the `expires_at`
+# passed to set(), whichever is sooner; neither means they live until
+# evicted. maxsize <= 0 turns the cache off.
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        if self.ttl is not None:
+            deadline = time.time() + self.ttl
+            expires_at = deadline if expires_at is None else min(expires_at, deadline)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at)
+            self._added(key, value)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Hooks for subclasses keeping an index over the keys; called with the
+    # lock held
+    def _added(self, key: Hashable, value: Any):
+        pass
+
+    def _removed(self, key: Hashable, value: Any):
+        pass
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._removed(key, entry[0])
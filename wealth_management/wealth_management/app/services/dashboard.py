@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+from sqlalchemy import JSON, func, literal_column, select
+from ..models.models import FinancialGoal, Portfolio, Transaction
+from ..models.schemas import TransactionResponse
+from .responses import response_columns
+from .valuation import allocation_query, summarize_all
+
+GOAL_COLUMNS = (
+    FinancialGoal.id, FinancialGoal.name, FinancialGoal.target_amount, FinancialGoal.current_amount,
+    FinancialGoal.target_date, FinancialGoal.priority,
+)
+
+# Rows of a subquery as one JSON array, built in the database; NULL when
+# there are no rows
+def _json_rows(dialect_name: str, rows):
+    if dialect_name == "postgresql":
+        array_agg, build_object = func.json_agg, func.json_build_object
+    else:
+        array_agg, build_object = func.json_group_array, func.json_object
+    # Keys are our own column names, inlined so asyncpg need not type them
+    pairs = [part for column in rows.c for part in (literal_column(f"'{column.name}'"), column)]
+    return select(array_agg(build_object(*pairs), type_=JSON)).select_from(rows).scalar_subquery()
+
+# Everything the dashboard shows as a single statement of three scalar
+# subqueries, so the page costs one round trip on one connection. Each part
+# is an index-backed per-user query of its own.
+def dashboard_query(dialect_name: str, user_id: int, recent: int):
+    allocation = (
+        allocation_query(user_id).add_columns(Portfolio.name).group_by(Portfolio.name)
+        .order_by(None).subquery("allocation")
+    )
+    goals = select(*GOAL_COLUMNS).where(FinancialGoal.user_id == user_id).subquery("goals")
+    transactions = (
+        select(*response_columns(Transaction, TransactionResponse))
+        .where(Transaction.user_id == user_id)
+        .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())
+        .limit(recent)
+        .subquery("recent")
+    )
+    return select(
+        _json_rows(dialect_name, allocation).label("allocation"),
+        _json_rows(dialect_name, goals).label("goals"),
+        _json_rows(dialect_name, transactions).label("transactions"),
+    )
+
+def _goal_progress(goal: dict) -> dict:
+    target, current = goal["target_amount"] or 0.0, goal["current_amount"] or 0.0
+    return {
+        **goal,
+        "current_amount": current,
+        "progress": current / target if target else 0.0,
+        "remaining_amount": max(target - current, 0.0),
+    }
+
+# JSON aggregates keep no order, so every list is sorted here. Takes a sync
+# Session: await db.run_sync(load_dashboard, user_id, recent).
+def load_dashboard(session, user_id: int, recent: int) -> dict:
+    row = session.execute(dashboard_query(session.get_bind().dialect.name, user_id, recent)).one()
+    allocation = [SimpleNamespace(**item) for item in row.allocation or ()]
+    names = {item.portfolio_id: item.name for item in allocation}
+
+    summary = summarize_all(sorted(allocation, key=lambda item: (item.portfolio_id, item.asset_type or "")))
+    for portfolio in summary["portfolios"]:
+        portfolio["name"] = names[portfolio["portfolio_id"]]
+    goals = sorted(row.goals or (), key=lambda goal: (goal["target_date"] or "", goal["id"]))
+    transactions = sorted(
+        row.transactions or (), key=lambda item: (item["transaction_date"], item["id"]), reverse=True,
+    )
+    return {
+        **summary,
+        "goals": [_goal_progress(goal) for goal in goals],
+        "recent_transactions": transactions,
+    }
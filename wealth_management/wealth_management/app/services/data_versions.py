@@ -0,0 +1,63 @@
+import hashlib
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import literal, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.bulk import dialect_insert
+from ..db.database import get_db
+from ..models.models import DataVersion
+from .auth import get_current_active_user
+from .token_cache import CurrentUser
+
+# Responses may be stored by the user's browser only, and must be revalidated
+# with If-None-Match before every reuse
+CACHE_CONTROL = "private, no-cache"
+
+def _bump(statement):
+    return statement.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"version": DataVersion.version + 1},
+    )
+
+# await db.run_sync(bump_version, current_user.id) last before every commit
+# that changes the user's data, so the row lock is held as briefly as possible
+def bump_version(session, user_id: int) -> None:
+    session.execute(_bump(dialect_insert(session)(DataVersion).values(user_id=user_id, version=1)))
+
+# Bump every user in `user_ids`, a select of one user id column, creating
+# missing rows. SQLite needs a WHERE on an upsert's SELECT to parse it.
+def bump_versions(session, user_ids) -> None:
+    users = user_ids.subquery()
+    session.execute(_bump(dialect_insert(session)(DataVersion).from_select(
+        ["user_id", "version"], select(users.c[0], literal(1)).where(true()),
+    )))
+
+def make_etag(user_id: int, version: int, request: Request) -> str:
+    digest = hashlib.blake2b(
+        f"{user_id}:{request.url.path}?{request.url.query}".encode(), digest_size=8,
+    ).hexdigest()
+    return f'"{version}-{digest}"'
+
+# If-None-Match compares weakly, so a W/ prefix added by a proxy still matches
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+# Route dependency for list and detail GETs. The version is read before the
+# route queries its data, so a write landing in between leaves the response
+# newer than its ETag, never older; the next request simply refetches.
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    version = await db.scalar(select(DataVersion.version).where(DataVersion.user_id == current_user.id)) or 0
+    headers = {
+        "ETag": make_etag(current_user.id, version, request),
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Authorization",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import AsyncIterator
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from ..db.database import stream_partitions
+from .records import CSV, JSONL
+
+# Configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+MEDIA_TYPES = {
+    CSV: "text/csv",
+    JSONL: "application/x-ndjson",
+}
+
+# ?format= for exports: csv (default) or jsonl / ndjson
+def export_format(fmt: str) -> str:
+    fmt = fmt.lower()
+    if fmt == "ndjson":
+        return JSONL
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Export format must be csv or jsonl",
+        )
+    return fmt
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows([_plain(value) for value in row.values()] for row in rows)
+    return buffer.getvalue()
+
+def _jsonl_chunk(rows) -> str:
+    return "".join(json.dumps(dict(row), default=_plain) + "\n" for row in rows)
+
+# One text chunk per partition of EXPORT_BATCH_SIZE rows, so the first bytes
+# go out after the first partition and memory never holds more than one.
+# Column names come from the statement, and the CSV header goes out before
+# the query even starts.
+async def export_rows(statement, fmt: str) -> AsyncIterator[str]:
+    encode = _csv_chunk if fmt == CSV else _jsonl_chunk
+    if fmt == CSV:
+        yield ",".join(statement.selected_columns.keys()) + "\n"
+    async for partition in stream_partitions(statement, EXPORT_BATCH_SIZE):
+        yield encode(partition)
+
+# The body streams on a connection of its own, so the request session (the
+# one the auth lookup used) is closed first to hand its connection back: an
+# export never holds two at once.
+async def export_response(statement, fmt: str, filename: str, db) -> StreamingResponse:
+    await db.close()
+    return StreamingResponse(
+        export_rows(statement, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
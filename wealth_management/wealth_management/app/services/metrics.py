@@ -0,0 +1,117 @@
+import os
+import time
+import weakref
+from typing import Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+# Configuration
+# Set for multi-worker servers: every worker writes its samples to files in
+# this directory and /metrics sums them, whichever worker serves the scrape.
+# prometheus_client reads it at import time, so set it before starting.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Gauges are summed across live workers in multiprocess mode
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ["method", "route"],
+)
+REQUESTS = Counter(
+    "http_requests", "Requests by route template and status code",
+    ["method", "route", "status"],
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being served",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections lent out by the pool",
+    ["engine"], multiprocess_mode="livesum",
+)
+DB_POOL_OPEN = Gauge(
+    "db_pool_open_connections", "Connections the pool holds open, lent out or idle",
+    ["engine"], multiprocess_mode="livesum",
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight", "bcrypt operations running",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_QUEUE = Gauge(
+    "password_hash_queue_depth", "bcrypt operations waiting for a worker",
+    multiprocess_mode="livesum",
+)
+
+# Engines whose pools already feed the gauges
+_instrumented = weakref.WeakSet()
+
+# Keep the pool gauges of `engine` (a sync Engine; pass async_engine.sync_engine)
+# up to date from pool events, so each worker's values are always current
+# rather than sampled by whichever worker happens to serve the scrape. Safe
+# to call again, e.g. from a second create_app(): an engine is only
+# instrumented once.
+def instrument_pool(engine, name: str):
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    opened = DB_POOL_OPEN.labels(name)
+    event.listen(engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(engine, "checkin", lambda *args: checked_out.dec())
+    event.listen(engine, "connect", lambda *args: opened.inc())
+    event.listen(engine, "close", lambda *args: opened.dec())
+    event.listen(engine, "close_detached", lambda *args: opened.dec())
+
+# The scrape body and its content type; sums the per-worker files in
+# multiprocess mode
+def render_metrics() -> Tuple[bytes, str]:
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+# Drop a dead worker's gauges from the sums; for the process manager's
+# worker-exit hook
+def mark_worker_dead(pid: int):
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+# Labelled children by (method, route template, status); looking them up
+# through labels() costs more than the observation itself
+_series = {}
+
+# ASGI middleware timing every request under its route template (FastAPI
+# puts the matched route in the scope), so /assets/1 and /assets/2 share a
+# series. Unmatched paths are one series, whatever was requested.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_PROGRESS.dec()
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "unmatched", status)
+            series = _series.get(key)
+            if series is None:
+                series = _series[key] = (REQUEST_LATENCY.labels(*key[:2]), REQUESTS.labels(*key[:2], str(status)))
+            series[0].observe(time.perf_counter() - started)
+            series[1].inc()
@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import datetime
+from typing import Sequence
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+
+# Header carrying the opaque cursor for the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Cursors are the sort key of the last row on a page, JSON-encoded and then
+# base64url'd so clients treat them as opaque strings
+def encode_cursor(*values) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError(cursor)
+        return values
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+# A cursor's row id, which must be an integer: anything else would reach the
+# driver as a mistyped parameter and fail there
+def _row_id(value) -> int:
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return value
+
+# Rows strictly after the cursor for a descending (timestamp, id) sort
+def after_desc(timestamp_column, id_column, cursor: str):
+    timestamp, row_id = decode_cursor(cursor, 2)
+    row_id = _row_id(row_id)
+    try:
+        timestamp = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return or_(
+        timestamp_column < timestamp,
+        and_(timestamp_column == timestamp, id_column < row_id),
+    )
+
+# Rows strictly after the cursor for an ascending id sort
+def after_id(id_column, cursor: str):
+    (row_id,) = decode_cursor(cursor, 1)
+    return id_column > _row_id(row_id)
+
+# Pages fetch limit + 1 rows; the extra row only signals that more exist.
+# Trims it off and sets the next-cursor header from the last row kept.
+def paginate(rows: Sequence, limit: int, response: Response, *key_attrs: str) -> list:
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*(getattr(last, attr) for attr in key_attrs))
+    return rows
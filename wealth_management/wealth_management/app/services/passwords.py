@@ -0,0 +1,83 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from ..db.statements import timed
+from .metrics import PASSWORD_HASH_IN_FLIGHT, PASSWORD_HASH_QUEUE
+
+# Configuration
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Password hashing. Hashes made with a different cost factor are flagged as
+# needing an update, which triggers a rehash on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Runs bcrypt on a small dedicated thread pool (bcrypt releases the GIL) so
+# logins never stall the event loop. At most `workers` hashes run at once and
+# at most `max_queue` more may wait; beyond that callers get a 503 right away
+# instead of piling up behind a login storm.
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = self._new_executor()
+        # Only touched from the event loop thread, so no lock is needed
+        self._pending = 0
+
+    # Threads start on first use, so a pool created before a fork is safe
+    def _new_executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+    @property
+    def in_flight(self) -> int:
+        return min(self._pending, self.workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._pending - self.workers, 0)
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent password operations, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        self._report()
+        try:
+            # Timed with the wait for a free worker, which is what callers feel
+            with timed("bcrypt"):
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            self._report()
+
+    # Publish the current load to the /metrics gauges
+    def _report(self):
+        PASSWORD_HASH_IN_FLIGHT.set(self.in_flight)
+        PASSWORD_HASH_QUEUE.set(self.queue_depth)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, password, hashed_password)
+
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an
+    # outdated scheme or cost factor and should be replaced
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(pwd_context.verify_and_update, password, hashed_password)
+
+    # Stop the worker threads once running hashes finish, for app shutdown.
+    # Like Engine.dispose(), the hasher stays usable: a later call starts a
+    # fresh pool.
+    def shutdown(self):
+        executor, self._executor = self._executor, self._new_executor()
+        executor.shutdown(wait=True)
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,184 @@
+import os
+from collections import deque
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from ..models.models import Asset, Transaction
+
+# Configuration
+PNL_BATCH_SIZE = int(os.getenv("PNL_BATCH_SIZE", "5000"))
+
+PNL_METHODS = ("fifo", "average")
+
+# Quantities this close to zero are zero, so float dust left by partial
+# sells never keeps an empty lot or position open
+EPSILON = 1e-9
+
+# Every transaction on the portfolio's assets in the order it happened.
+# Only ledger columns are read; the few asset details needed for the report
+# are looked up once per asset afterwards with positions_assets_query.
+def ledger_query(user_id: int, portfolio_id: int):
+    return (
+        select(
+            Transaction.id, Transaction.asset_id, Transaction.transaction_type,
+            Transaction.amount, Transaction.quantity, Transaction.transaction_date,
+        )
+        .join(Asset, Asset.id == Transaction.asset_id)
+        .where(Asset.portfolio_id == portfolio_id, Transaction.user_id == user_id)
+        .order_by(Transaction.transaction_date, Transaction.id)
+    )
+
+def positions_assets_query(asset_ids: Iterable[int]):
+    return select(Asset.id, Asset.name, Asset.ticker_symbol, Asset.current_price).where(Asset.id.in_(list(asset_ids)))
+
+# One asset's holding. Lots are kept oldest first as
+# [transaction_id, date, quantity, cost] so sells consume them in FIFO
+# order under both methods; with average cost the lots only track quantity
+# and are priced at the running average, so they can be left out entirely
+# (track_lots=False) when only the totals are wanted.
+class Position:
+    __slots__ = (
+        "asset_id", "lots", "track_lots", "quantity", "cost_basis",
+        "realized_gain", "income", "oversold_quantity",
+    )
+
+    def __init__(self, asset_id: int, track_lots: bool = True):
+        self.asset_id = asset_id
+        self.lots = deque()
+        self.track_lots = track_lots
+        self.quantity = 0.0
+        self.cost_basis = 0.0
+        self.realized_gain = 0.0
+        self.income = 0.0
+        self.oversold_quantity = 0.0
+
+    def buy(self, transaction_id: int, date, quantity: float, amount: float):
+        if self.track_lots:
+            self.lots.append([transaction_id, date, quantity, amount])
+        self.quantity += quantity
+        self.cost_basis += amount
+
+    # Units sold beyond what is held have no known cost; they are realized at
+    # zero cost and reported as oversold
+    def sell(self, quantity: float, amount: float, fifo: bool):
+        matched = min(quantity, self.quantity)
+        average = self.cost_basis / self.quantity if self.quantity > EPSILON else 0.0
+        lot_cost = self._take_from_lots(matched)
+        cost = lot_cost if fifo else average * matched
+
+        self.oversold_quantity += quantity - matched
+        self.quantity -= matched
+        self.cost_basis -= cost
+        self.realized_gain += amount - cost
+        if self.quantity <= EPSILON:
+            self.quantity = self.cost_basis = 0.0
+            self.lots.clear()
+
+    # Remove `quantity` units from the oldest lots; returns their cost
+    def _take_from_lots(self, quantity: float) -> float:
+        cost = 0.0
+        while quantity > EPSILON and self.lots:
+            lot = self.lots[0]
+            taken = min(quantity, lot[2])
+            taken_cost = lot[3] * taken / lot[2]
+            lot[2] -= taken
+            lot[3] -= taken_cost
+            cost += taken_cost
+            quantity -= taken
+            if lot[2] <= EPSILON:
+                self.lots.popleft()
+        return cost
+
+    # Apply one ledger row; returns False for rows that do not affect
+    # positions (see PnlEngine)
+    def apply(self, transaction_id: int, kind: Optional[str], amount: Optional[float], quantity: Optional[float], date, fifo: bool) -> bool:
+        kind = kind.lower() if kind else ""
+        if kind == "dividend":
+            self.income += amount or 0.0
+        elif quantity is None or quantity <= 0:
+            return False
+        elif kind == "buy":
+            self.buy(transaction_id, date, quantity, amount or 0.0)
+        elif kind == "sell":
+            self.sell(quantity, amount or 0.0, fifo)
+        else:
+            return False
+        return True
+
+    def as_dict(self, fifo: bool, asset, lots: bool = True) -> dict:
+        market_value = self.quantity * ((asset.current_price if asset else None) or 0.0)
+        average = self.cost_basis / self.quantity if self.quantity > EPSILON else 0.0
+        unrealized_gain = market_value - self.cost_basis
+        return {
+            "asset_id": self.asset_id,
+            "name": asset.name if asset else None,
+            "ticker_symbol": asset.ticker_symbol if asset else None,
+            "quantity": self.quantity,
+            "cost_basis": self.cost_basis,
+            "market_value": market_value,
+            "realized_gain": self.realized_gain,
+            "unrealized_gain": unrealized_gain,
+            "income": self.income,
+            "total_gain": self.realized_gain + unrealized_gain + self.income,
+            "oversold_quantity": self.oversold_quantity,
+            "lots": [
+                {
+                    "transaction_id": transaction_id,
+                    "date": date,
+                    "quantity": quantity,
+                    "unit_cost": cost / quantity if fifo else average,
+                    "cost_basis": cost if fifo else average * quantity,
+                }
+                for transaction_id, date, quantity, cost in (self.lots if lots else ())
+            ],
+        }
+
+# Replays a ledger in date order into positions. Rows can be fed in any
+# number of batches as long as the batches arrive in order, so the ledger is
+# never held in memory. Buys and sells need a positive quantity (amount is the
+# total paid or received); dividends add income; other types, and buys or
+# sells without a quantity, are counted as skipped.
+class PnlEngine:
+    def __init__(self, method: str = "fifo", track_lots: bool = True):
+        self.fifo = method == "fifo"
+        self.method = method
+        self.track_lots = track_lots
+        self.positions: Dict[int, Position] = {}
+        self.transactions = 0
+        self.skipped = 0
+
+    # Rows are ledger_query rows (or any sequences in the same column order)
+    def replay(self, rows: Iterable) -> None:
+        positions = self.positions
+        fifo = self.fifo
+        skipped = 0
+        count = 0
+        for transaction_id, asset_id, kind, amount, quantity, date in rows:
+            count += 1
+            position = positions.get(asset_id)
+            if position is None:
+                position = positions[asset_id] = Position(asset_id, self.track_lots)
+            if not position.apply(transaction_id, kind, amount, quantity, date, fifo):
+                skipped += 1
+        self.transactions += count
+        self.skipped += skipped
+
+    # `assets` maps asset id to a row with name, ticker_symbol and
+    # current_price (positions_assets_query)
+    def report(self, portfolio_id: Optional[int] = None, assets: Optional[Dict[int, object]] = None, lots: bool = True) -> dict:
+        assets = assets or {}
+        positions = [
+            self.positions[asset_id].as_dict(self.fifo, assets.get(asset_id), lots)
+            for asset_id in sorted(self.positions)
+        ]
+        totals = {
+            name: sum(position[name] for position in positions)
+            for name in ("cost_basis", "market_value", "realized_gain", "unrealized_gain", "income", "total_gain")
+        }
+        return {
+            "portfolio_id": portfolio_id,
+            "method": self.method,
+            "transactions": self.transactions,
+            "skipped": self.skipped,
+            **totals,
+            "positions": positions,
+        }
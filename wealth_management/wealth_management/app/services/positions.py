@@ -0,0 +1,203 @@
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, select
+from ..db.bulk import dialect_insert
+from ..models.models import Asset, Position, Transaction
+from . import pnl
+
+# Configuration
+POSITIONS_BATCH_SIZE = int(os.getenv("POSITIONS_BATCH_SIZE", "10000"))
+
+POSITION_FIELDS = ("quantity", "cost_basis", "realized_gain", "income", "oversold_quantity")
+
+# Stored and replayed values closer than this (relative to their size) are
+# equal; summation order alone can move the last few digits
+DRIFT_TOLERANCE = 1e-6
+
+# Positions follow the average-cost method of app/services/pnl.py, the one
+# that can be carried forward one transaction at a time. Appending a
+# transaction is O(1); inserting one before the position's latest
+# transaction, or deleting one, replays that asset's ledger.
+
+# Stored positions in one portfolio with the asset details needed to value
+# them; reads the positions table only, never the ledger
+def holdings_query(user_id: int, portfolio_id: int):
+    return (
+        select(
+            Position.asset_id, Asset.name, Asset.ticker_symbol, Asset.current_price,
+            Position.quantity, Position.cost_basis, Position.realized_gain, Position.income,
+            Position.transaction_count, Position.last_transaction_date,
+        )
+        .join(Asset, Asset.id == Position.asset_id)
+        .where(Position.user_id == user_id, Asset.portfolio_id == portfolio_id)
+        .order_by(Position.asset_id)
+    )
+
+def holding(row) -> dict:
+    market_value = row.quantity * (row.current_price or 0.0)
+    return {
+        **row._asdict(),
+        "average_cost": row.cost_basis / row.quantity if row.quantity else None,
+        "market_value": market_value,
+        "unrealized_gain": market_value - row.cost_basis,
+    }
+
+# Insert the (user, asset) position if missing, then lock and load it
+def _locked_position(session, user_id: int, asset_id: int) -> Position:
+    session.execute(dialect_insert(session)(Position).values(user_id=user_id, asset_id=asset_id).on_conflict_do_nothing())
+    return session.scalar(
+        select(Position)
+        .where(Position.user_id == user_id, Position.asset_id == asset_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+
+# Fold a new transaction into its position, in the caller's transaction.
+# Takes a sync Session: await db.run_sync(apply_transaction, transaction).
+# `transaction` may be an instance or a row RETURNING its columns.
+def apply_transaction(session, transaction: Transaction) -> None:
+    if transaction.asset_id is None:
+        return
+    session.flush()
+    position = _locked_position(session, transaction.user_id, transaction.asset_id)
+    last_date = position.last_transaction_date
+    if last_date is not None and transaction.transaction_date < last_date:
+        rebuild_positions(session, transaction.user_id, [transaction.asset_id])
+        return
+
+    holding = pnl.Position(position.asset_id, track_lots=False)
+    for field in POSITION_FIELDS:
+        setattr(holding, field, getattr(position, field))
+    holding.apply(
+        transaction.id, transaction.transaction_type, transaction.amount,
+        transaction.quantity, transaction.transaction_date, fifo=False,
+    )
+    for field in POSITION_FIELDS:
+        setattr(position, field, getattr(holding, field))
+    position.transaction_count += 1
+    position.last_transaction_date = transaction.transaction_date
+
+# Take a deleted transaction back out of its position. The average cost of
+# every later sell depends on it, so the asset is replayed.
+def remove_transaction(session, transaction: Transaction) -> None:
+    if transaction.asset_id is None:
+        return
+    _locked_position(session, transaction.user_id, transaction.asset_id)
+    rebuild_positions(session, transaction.user_id, [transaction.asset_id])
+
+# Replay the ledger into fresh position rows. The ledger is streamed ordered
+# by (user, asset, date, id), so each position is finished as soon as the next
+# one starts and memory holds positions, not transactions.
+def replay_positions(session, user_id: Optional[int] = None, asset_ids: Optional[Iterable[int]] = None, batch_size: int = POSITIONS_BATCH_SIZE) -> Tuple[List[dict], int]:
+    query = select(
+        Transaction.user_id, Transaction.asset_id, Transaction.id, Transaction.transaction_type,
+        Transaction.amount, Transaction.quantity, Transaction.transaction_date,
+    ).where(Transaction.asset_id.isnot(None))
+    if user_id is not None:
+        query = query.where(Transaction.user_id == user_id)
+    if asset_ids is not None:
+        query = query.where(Transaction.asset_id.in_(list(asset_ids)))
+    query = query.order_by(Transaction.user_id, Transaction.asset_id, Transaction.transaction_date, Transaction.id)
+
+    rows = []
+    key = holding = None
+    count = last_date = None
+    transactions = 0
+
+    def finish():
+        rows.append({
+            "user_id": key[0], "asset_id": key[1],
+            **{field: getattr(holding, field) for field in POSITION_FIELDS},
+            "transaction_count": count, "last_transaction_date": last_date,
+        })
+
+    for owner, asset_id, transaction_id, kind, amount, quantity, date in session.execute(query.execution_options(yield_per=batch_size)):
+        if (owner, asset_id) != key:
+            if key is not None:
+                finish()
+            key, holding, count = (owner, asset_id), pnl.Position(asset_id, track_lots=False), 0
+        holding.apply(transaction_id, kind, amount, quantity, date, fifo=False)
+        count += 1
+        last_date = date
+        transactions += 1
+    if key is not None:
+        finish()
+    return rows, transactions
+
+def _scope(statement, user_id: Optional[int], asset_ids: Optional[Iterable[int]]):
+    if user_id is not None:
+        statement = statement.where(Position.user_id == user_id)
+    if asset_ids is not None:
+        statement = statement.where(Position.asset_id.in_(list(asset_ids)))
+    return statement
+
+# Overwrite the positions in scope (everything, one user, or some of a
+# user's assets) with a replay of the ledger; the caller commits. Rows are
+# updated in place rather than deleted and re-inserted, so a writer waiting
+# on a position's row lock gets the rebuilt row, not a vanished one. Only
+# positions with no transactions left are deleted.
+def rebuild_positions(session, user_id: Optional[int] = None, asset_ids: Optional[Iterable[int]] = None) -> dict:
+    started = time.perf_counter()
+    asset_ids = list(asset_ids) if asset_ids is not None else None
+    session.flush()
+    rows, transactions = replay_positions(session, user_id, asset_ids)
+
+    statement = dialect_insert(session)(Position)
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "asset_id"],
+        set_={
+            column: statement.excluded[column]
+            for column in POSITION_FIELDS + ("transaction_count", "last_transaction_date")
+        },
+    )
+    for start in range(0, len(rows), POSITIONS_BATCH_SIZE):
+        session.execute(statement, rows[start:start + POSITIONS_BATCH_SIZE])
+
+    has_ledger = select(Transaction.id).where(
+        Transaction.user_id == Position.user_id,
+        Transaction.asset_id == Position.asset_id,
+    ).exists()
+    session.execute(
+        _scope(delete(Position), user_id, asset_ids).where(~has_ledger)
+        .execution_options(synchronize_session="fetch")
+    )
+    return {"positions": len(rows), "transactions": transactions, "seconds": round(time.perf_counter() - started, 3)}
+
+def _differs(stored: float, replayed: float) -> bool:
+    return abs(stored - replayed) > DRIFT_TOLERANCE * max(1.0, abs(stored), abs(replayed))
+
+# Compare stored positions against a replay of the ledger without writing.
+# Every position that is missing, extra or off goes to on_drift; the counts
+# are returned.
+def check_positions(session, user_id: Optional[int] = None, on_drift: Optional[Callable[[dict], None]] = None) -> dict:
+    started = time.perf_counter()
+    replayed, transactions = replay_positions(session, user_id)
+    expected: Dict[Tuple[int, int], dict] = {(row["user_id"], row["asset_id"]): row for row in replayed}
+    drifted = []
+    for position in session.scalars(_scope(select(Position), user_id, None)):
+        row = expected.pop((position.user_id, position.asset_id), None)
+        fields = [
+            field for field in POSITION_FIELDS + ("transaction_count",)
+            if row is None or _differs(getattr(position, field), row[field])
+        ]
+        # Positions with no ledger left are fine as long as they are empty
+        if row is None and not any(getattr(position, field) for field in POSITION_FIELDS):
+            continue
+        if fields:
+            drifted.append({
+                "user_id": position.user_id, "asset_id": position.asset_id, "fields": fields,
+                "stored": {field: getattr(position, field) for field in fields},
+                "replayed": {field: row[field] for field in fields} if row else None,
+            })
+    drifted.extend(
+        {"user_id": user, "asset_id": asset, "fields": ["missing"], "stored": None, "replayed": row}
+        for (user, asset), row in expected.items()
+    )
+    if on_drift is not None:
+        for drift in drifted:
+            on_drift(drift)
+    return {
+        "positions": len(replayed), "transactions": transactions, "drifted": len(drifted),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
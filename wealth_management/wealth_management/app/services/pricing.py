@@ -0,0 +1,129 @@
+import csv
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence
+from sqlalchemy import Float, String, bindparam, column, func, select, update, values
+from ..models.models import Asset, Portfolio
+from .data_versions import bump_versions
+
+# Configuration
+PRICE_SOURCE = os.getenv("PRICE_SOURCE", "")
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "500"))
+
+# A source of latest prices. Implementations get one batch of tickers at a
+# time and return whatever they can quote; missing tickers are left alone.
+class PriceSource(ABC):
+    @abstractmethod
+    def quotes(self, tickers: Sequence[str]) -> Dict[str, float]:
+        ...
+
+# Fixed prices, for tests and local development
+class StaticPriceSource(PriceSource):
+    def __init__(self, prices: Dict[str, float]):
+        self.prices = {ticker.upper(): float(price) for ticker, price in prices.items()}
+
+    def quotes(self, tickers: Sequence[str]) -> Dict[str, float]:
+        return {ticker: self.prices[ticker.upper()] for ticker in tickers if ticker.upper() in self.prices}
+
+# Prices from a local file: CSV with ticker,price columns or a JSON object
+# mapping ticker to price. Stand-in for a market data feed.
+class FilePriceSource(StaticPriceSource):
+    def __init__(self, path: str):
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            if path.endswith(".json"):
+                prices = json.load(file)
+            else:
+                prices = {row["ticker"]: row["price"] for row in csv.DictReader(file) if row.get("price")}
+        super().__init__(prices)
+
+PRICE_SOURCES: Dict[str, Callable[[str], PriceSource]] = {
+    "file": FilePriceSource,
+}
+
+# Build a source from a "kind:argument" spec such as "file:prices.csv"
+def get_price_source(spec: str = PRICE_SOURCE) -> PriceSource:
+    kind, _, argument = spec.partition(":")
+    if kind not in PRICE_SOURCES:
+        raise ValueError(f"Unknown price source {spec!r}; expected one of {', '.join(PRICE_SOURCES)}")
+    return PRICE_SOURCES[kind](argument)
+
+# Every distinct ticker, in order. Tens of thousands of short strings fit
+# comfortably in memory and one hash aggregate beats re-walking the index
+# for each batch.
+def distinct_tickers(session) -> List[str]:
+    return list(session.scalars(
+        select(Asset.ticker_symbol).where(Asset.ticker_symbol.isnot(None))
+        .distinct().order_by(Asset.ticker_symbol)
+    ))
+
+# Apply one batch of quotes with a single set-based UPDATE; returns rows changed.
+# Rows already at the quoted price are not touched, so they take no lock.
+# This goes through the Core table, not the ORM, so nothing is loaded.
+def apply_quotes(session, quotes: Dict[str, float]) -> int:
+    if not quotes:
+        return 0
+    updated = _update_prices(session, quotes)
+    if updated:
+        # Owners of the quoted tickers see new prices; their ETags must change
+        bump_versions(session, (
+            select(Portfolio.user_id).join(Asset, Asset.portfolio_id == Portfolio.id)
+            .where(Asset.ticker_symbol.in_(list(quotes)))
+            .distinct().order_by(Portfolio.user_id)
+        ))
+    return updated
+
+def _update_prices(session, quotes: Dict[str, float]) -> int:
+    assets = Asset.__table__
+    if session.get_bind().dialect.name != "postgresql":
+        # No VALUES lists in UPDATE ... FROM here; one executemany instead
+        result = session.execute(
+            update(assets)
+            .where(assets.c.ticker_symbol == bindparam("ticker"),
+                   assets.c.current_price.is_distinct_from(bindparam("price")))
+            .values(current_price=bindparam("price"), updated_at=func.now()),
+            [{"ticker": ticker, "price": price} for ticker, price in quotes.items()],
+        )
+        return result.rowcount
+
+    # Batches are consecutive runs of sorted tickers; bounding the range as
+    # well lets the planner probe ix_assets_ticker_symbol instead of hash
+    # joining the VALUES list against a scan of the whole table
+    quoted = values(column("ticker", String), column("price", Float), name="quotes").data(list(quotes.items()))
+    result = session.execute(
+        update(assets)
+        .where(assets.c.ticker_symbol == quoted.c.ticker,
+               assets.c.ticker_symbol.between(min(quotes), max(quotes)),
+               assets.c.current_price.is_distinct_from(quoted.c.price))
+        .values(current_price=quoted.c.price, updated_at=func.now())
+    )
+    return result.rowcount
+
+# Reprice every holding. Tickers are walked in batches; each batch is quoted
+# and applied in its own short transaction so user writes on the same assets
+# never wait behind the whole run.
+def refresh_prices(
+    session,
+    source: PriceSource,
+    batch_size: int = PRICE_BATCH_SIZE,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    report = {"batches": 0, "tickers": 0, "quoted": 0, "updated": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    tickers = distinct_tickers(session)
+    session.commit()
+    for start in range(0, len(tickers), batch_size):
+        batch = tickers[start:start + batch_size]
+        quotes = source.quotes(batch)
+        report["updated"] += apply_quotes(session, quotes)
+        session.commit()
+
+        report["batches"] += 1
+        report["tickers"] += len(batch)
+        report["quoted"] += len(quotes)
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        if on_progress is not None:
+            on_progress(dict(report))
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
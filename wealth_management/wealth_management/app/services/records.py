@@ -0,0 +1,158 @@
+import codecs
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, Iterable, Iterator, Optional, Tuple
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+# Incremental parsing of uploaded CSV / JSON Lines files. Nothing here holds
+# more than one record (plus one network chunk) in memory at a time.
+
+# Invalid rows are always counted, but only this many are described in detail
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+CSV = "csv"
+JSONL = "jsonl"
+
+CONTENT_TYPES = {
+    "text/csv": CSV,
+    "application/csv": CSV,
+    "application/x-ndjson": JSONL,
+    "application/jsonl": JSONL,
+    "application/x-jsonlines": JSONL,
+}
+
+# (row_number, record, error): exactly one of record / error is set
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+# Pick the file format from an explicit ?format= or the request Content-Type
+def detect_format(content_type: Optional[str], explicit: Optional[str] = None) -> str:
+    if explicit:
+        fmt = explicit.lower()
+        if fmt in (CSV, JSONL, "ndjson"):
+            return JSONL if fmt == "ndjson" else fmt
+    else:
+        media_type = (content_type or "").split(";")[0].strip().lower()
+        if media_type in CONTENT_TYPES:
+            return CONTENT_TYPES[media_type]
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Upload CSV (text/csv) or JSON Lines (application/x-ndjson)",
+    )
+
+# Line-at-a-time record parser. Row numbers count data rows from 1, so a CSV
+# header is not counted. Empty CSV cells mean "not provided" and become None.
+class RecordParser:
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.row = 0
+        self.header = None
+        self._buffered = ""
+
+    def feed(self, line: str) -> Optional[ParsedRow]:
+        if self.fmt == JSONL:
+            return self._record(line, self._parse_json) if line.strip() else None
+
+        # A CSV record is complete once its double quotes balance, which
+        # handles quoted fields spanning several lines
+        self._buffered += line
+        if self._buffered.count('"') % 2:
+            return None
+        text, self._buffered = self._buffered, ""
+        if not text.strip():
+            return None
+        if self.header is None:
+            self.header = [name.strip() for name in next(csv.reader(io.StringIO(text)))]
+            return None
+        return self._record(text, self._parse_csv)
+
+    def finish(self) -> Optional[ParsedRow]:
+        if self._buffered.strip() and self.header is not None:
+            self._buffered = ""
+            self.row += 1
+            return self.row, None, "unterminated quoted field"
+        return None
+
+    def _record(self, text: str, parse) -> ParsedRow:
+        self.row += 1
+        try:
+            return self.row, parse(text), None
+        except (ValueError, csv.Error) as exc:
+            return self.row, None, str(exc)
+
+    def _parse_csv(self, text: str) -> dict:
+        values = next(csv.reader(io.StringIO(text)), [])
+        if len(values) != len(self.header):
+            raise ValueError(f"expected {len(self.header)} fields, got {len(values)}")
+        return {key: (value if value != "" else None) for key, value in zip(self.header, values)}
+
+    @staticmethod
+    def _parse_json(text: str) -> dict:
+        record = json.loads(text)
+        if not isinstance(record, dict):
+            raise ValueError("each line must be a JSON object")
+        return record
+
+# Parse lines from a file opened by a CLI tool
+def parse_records(lines: Iterable[str], fmt: str) -> Iterator[ParsedRow]:
+    parser = RecordParser(fmt)
+    for line in lines:
+        parsed = parser.feed(line)
+        if parsed is not None:
+            yield parsed
+    parsed = parser.finish()
+    if parsed is not None:
+        yield parsed
+
+# Parse a streamed request body (e.g. request.stream())
+async def aparse_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[ParsedRow]:
+    parser = RecordParser(fmt)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be an incomplete line; keep it for the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            parsed = parser.feed(line)
+            if parsed is not None:
+                yield parsed
+    pending += decoder.decode(b"", final=True)
+    for parsed in (parser.feed(pending) if pending else None, parser.finish()):
+        if parsed is not None:
+            yield parsed
+
+# Flatten a pydantic ValidationError into one readable line per row
+def describe_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+# Outcome of an import or ingestion run, shaped like ImportResponse
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row: int, error: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    @property
+    def processed(self) -> int:
+        return self.imported + self.duplicates + self.failed
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
@@ -0,0 +1,31 @@
+from typing import Iterable, List, Type
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from ..db.statements import timed
+
+# JSON encoded by orjson. UTC datetimes end in Z, as Pydantic writes them,
+# so clients read the same values from lean and validated responses.
+class LeanJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with timed("serialize"):
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+# Columns of `model` named like the fields of `schema`, in field order.
+# Selecting these through Core returns plain rows: no ORM identity map, no
+# instance state, only the columns the response needs.
+def response_columns(model, schema: Type[BaseModel]) -> List:
+    return [getattr(model, name) for name in schema.model_fields]
+
+# Lean list responses for rows of response_columns. The rows come straight
+# from typed columns, so they are turned into dicts and encoded without a
+# trip through the response model; the route's response_model still
+# documents them. Headers already set on the route's `response` (ETag,
+# X-Next-Cursor) are carried over, as FastAPI does for returned models.
+def lean_response(rows: Iterable, response: Response) -> LeanJSONResponse:
+    rows = list(rows)
+    keys = rows[0]._fields if rows else ()
+    lean = LeanJSONResponse([dict(zip(keys, row)) for row in rows])
+    lean.headers.raw.extend(response.headers.raw)
+    return lean
@@ -0,0 +1,166 @@
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import Date, Integer, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..models.models import Asset, Portfolio, PortfolioSnapshot
+from .valuation import cost_basis_expr, market_value_expr
+
+INTERVALS = ("day", "week", "month")
+
+# Values closer than this are treated as unchanged, so float noise from a
+# different summation order never produces a snapshot
+CHANGE_TOLERANCE = 0.005
+
+# Per-type breakdown as one JSON object per portfolio, built in the database
+def _breakdown_agg(dialect_name: str, by_type):
+    if dialect_name == "postgresql":
+        object_agg, build_object, empty = func.json_object_agg, func.json_build_object, func.json_build_object()
+    else:
+        object_agg, build_object, empty = func.json_group_object, func.json_object, func.json_object()
+    return func.coalesce(
+        object_agg(
+            by_type.c.asset_type,
+            build_object(
+                "market_value", by_type.c.market_value,
+                "cost_basis", by_type.c.cost_basis,
+                "asset_count", by_type.c.asset_count,
+            ),
+        ).filter(by_type.c.asset_count > 0),
+        empty,
+    )
+
+# Whether a stored breakdown equals a freshly aggregated one, per asset type.
+# Postgres compares them as jsonb, which ignores key order; SQLite builds
+# both the same way, so their minified text matches. This is exact, so float
+# noise here costs at worst one redundant row, never a missed change.
+def _same_breakdown(dialect_name: str, stored, current):
+    if dialect_name == "postgresql":
+        return cast(stored, JSONB) == cast(current, JSONB)
+    return func.json(stored) == func.json(current)
+
+# Current valuation of every portfolio, one row each, empty portfolios included
+def current_valuations(dialect_name: str):
+    by_type = (
+        select(
+            Portfolio.id.label("portfolio_id"),
+            func.coalesce(Asset.asset_type, "other").label("asset_type"),
+            func.count(Asset.id).label("asset_count"),
+            func.coalesce(func.sum(market_value_expr), 0.0).label("market_value"),
+            func.coalesce(func.sum(cost_basis_expr), 0.0).label("cost_basis"),
+        )
+        .select_from(Portfolio)
+        .outerjoin(Asset, Asset.portfolio_id == Portfolio.id)
+        .group_by(Portfolio.id, func.coalesce(Asset.asset_type, "other"))
+        .subquery("by_type")
+    )
+    return (
+        select(
+            by_type.c.portfolio_id,
+            func.sum(by_type.c.market_value).label("market_value"),
+            func.sum(by_type.c.cost_basis).label("cost_basis"),
+            func.sum(by_type.c.asset_count).label("asset_count"),
+            _breakdown_agg(dialect_name, by_type).label("breakdown"),
+        )
+        .group_by(by_type.c.portfolio_id)
+        .subquery("current")
+    )
+
+# Write snapshot rows for `day` with one INSERT ... SELECT. A portfolio gets
+# a row only if its totals or per-type breakdown differ from its latest
+# snapshot on or before that day, so unchanged portfolios cost nothing and
+# history stays sparse. Running the job again on the same day overwrites that
+# day's rows. Returns the number of portfolios written; the caller commits.
+def take_snapshots(session, day: Optional[date] = None) -> int:
+    day = day or date.today()
+    dialect_name = session.get_bind().dialect.name
+    current = current_valuations(dialect_name)
+    snapshot_day = literal(day, Date)
+
+    latest = PortfolioSnapshot.__table__.alias("latest")
+    latest_date = (
+        select(func.max(PortfolioSnapshot.snapshot_date))
+        .where(PortfolioSnapshot.portfolio_id == latest.c.portfolio_id,
+               PortfolioSnapshot.snapshot_date <= snapshot_day)
+        .correlate(latest)
+        .scalar_subquery()
+    )
+    unchanged = (
+        select(latest.c.id)
+        .where(
+            latest.c.portfolio_id == current.c.portfolio_id,
+            latest.c.snapshot_date == latest_date,
+            func.abs(latest.c.market_value - current.c.market_value) < CHANGE_TOLERANCE,
+            func.abs(latest.c.cost_basis - current.c.cost_basis) < CHANGE_TOLERANCE,
+            latest.c.asset_count == current.c.asset_count,
+            _same_breakdown(dialect_name, latest.c.breakdown, current.c.breakdown),
+        )
+        .exists()
+    )
+    changed = select(
+        current.c.portfolio_id, snapshot_day, current.c.market_value, current.c.cost_basis,
+        current.c.asset_count.cast(Integer), current.c.breakdown,
+    ).where(~unchanged)
+
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    statement = insert(PortfolioSnapshot).from_select(
+        ["portfolio_id", "snapshot_date", "market_value", "cost_basis", "asset_count", "breakdown"],
+        changed,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["portfolio_id", "snapshot_date"],
+        set_={
+            column: statement.excluded[column]
+            for column in ("market_value", "cost_basis", "asset_count", "breakdown")
+        },
+    )
+    return session.execute(statement).rowcount
+
+# Snapshots from the one in effect at `start` up to `end`, oldest first.
+# Served by uq_portfolio_snapshots_portfolio_id_date as a single range scan.
+def history_query(portfolio_id: int, start: Optional[date], end: date):
+    query = select(PortfolioSnapshot).where(
+        PortfolioSnapshot.portfolio_id == portfolio_id,
+        PortfolioSnapshot.snapshot_date <= end,
+    )
+    if start is not None:
+        in_effect = (
+            select(func.max(PortfolioSnapshot.snapshot_date))
+            .where(PortfolioSnapshot.portfolio_id == portfolio_id, PortfolioSnapshot.snapshot_date <= start)
+            .scalar_subquery()
+        )
+        query = query.where(PortfolioSnapshot.snapshot_date >= func.coalesce(in_effect, start))
+    return query.order_by(PortfolioSnapshot.snapshot_date)
+
+# Last day of the bucket containing `day`
+def _bucket_end(day: date, interval: str) -> date:
+    if interval == "week":
+        return day + timedelta(days=6 - day.weekday())
+    if interval == "month":
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    return day
+
+# One point per day, week or month from `start` to `end`, each carrying the
+# value in effect at the end of its bucket (capped at `end`). Snapshots are
+# only written on change, so quiet stretches are filled forward.
+def downsample(snapshots: Iterable[PortfolioSnapshot], start: Optional[date], end: date, interval: str) -> List[dict]:
+    snapshots = list(snapshots)
+    if not snapshots:
+        return []
+    day = max(start or snapshots[0].snapshot_date, snapshots[0].snapshot_date)
+    points = []
+    index = 0
+    while day <= end:
+        bucket_end = min(_bucket_end(day, interval), end)
+        while index + 1 < len(snapshots) and snapshots[index + 1].snapshot_date <= bucket_end:
+            index += 1
+        snapshot = snapshots[index]
+        points.append({
+            "date": bucket_end,
+            "market_value": snapshot.market_value,
+            "cost_basis": snapshot.cost_basis,
+            "breakdown": snapshot.breakdown,
+        })
+        day = bucket_end + timedelta(days=1)
+    return points
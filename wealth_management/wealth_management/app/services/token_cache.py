@@ -0,0 +1,50 @@
+import hashlib
+import os
+from typing import NamedTuple, Optional
+from .cache import TTLCache
+
+# Configuration
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Upper bound on how long a worker trusts a cached user, so a deactivation
+# done by another worker process is picked up within this many seconds
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
+# Lightweight authenticated user, enough for ownership filters in routers
+class CurrentUser(NamedTuple):
+    id: int
+    email: str
+    is_active: bool
+
+# Bounded LRU of verified tokens -> CurrentUser, each entry expiring no later
+# than the token itself, with an index by user for invalidation
+class TokenCache(TTLCache):
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL_SECONDS):
+        super().__init__(maxsize, ttl)
+        self._keys_by_user = {}
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[CurrentUser]:
+        return super().get(self.key(token))
+
+    def set(self, token: str, user: CurrentUser, exp: float):
+        super().set(self.key(token), user, expires_at=exp)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def _added(self, key: str, user: CurrentUser):
+        self._keys_by_user.setdefault(user.id, set()).add(key)
+
+    def _removed(self, key: str, user: CurrentUser):
+        keys = self._keys_by_user.get(user.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user.id]
+
+token_cache = TokenCache()
@@ -0,0 +1,190 @@
+import os
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, Text, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from ..db.bulk import copy_rows
+from ..models.models import Asset, Portfolio, Transaction
+from ..models.schemas import TransactionIngestRow
+from .data_versions import bump_version
+from .positions import rebuild_positions
+from .records import ImportReport, describe_validation_error
+
+# Configuration
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+
+INGEST_COLUMNS = (
+    "transaction_type", "amount", "quantity", "asset_id", "user_id",
+    "transaction_date", "notes", "external_id",
+)
+
+# Per-batch staging table. It is created inside each batch's transaction and
+# dropped on commit, so it never outlives the pooled connection it lives on.
+staging_table = Table(
+    "transactions_staging", MetaData(),
+    Column("transaction_type", String),
+    Column("amount", Float),
+    Column("quantity", Float),
+    Column("asset_id", Integer),
+    Column("user_id", Integer),
+    Column("transaction_date", DateTime(timezone=True)),
+    Column("notes", Text),
+    Column("external_id", String),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+# (row_number, ingest row) pairs waiting for the next load
+PendingRow = Tuple[int, TransactionIngestRow]
+
+# Streams a custodian feed into a user's transactions. Rows are validated as
+# they arrive and loaded in batches; each batch resolves asset ownership with
+# one IN query and skips external ids the user already has, so re-running a
+# partially loaded file only inserts what is missing. Memory is bounded by
+# the batch size, not the file size.
+#
+# The ingestor itself never touches the database outside load_batch and
+# finish, which take a sync Session: the endpoint calls them through
+# `await db.run_sync(...)` and the CLI calls them directly. Callers commit
+# after every batch; a batch that inserts anything bumps the user's data
+# version last, in the same transaction. Feeds arrive in any date order, so
+# positions are not carried forward row by row; finish rebuilds the ones the
+# feed touched in a transaction of its own, after the last batch, so the
+# version row is never locked before a position row.
+class TransactionIngestor:
+    def __init__(
+        self,
+        user_id: int,
+        batch_size: int = INGEST_BATCH_SIZE,
+        on_progress: Optional[Callable[[dict], None]] = None,
+    ):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.report = ImportReport()
+        self.batches = 0
+        # Rows without a date are stamped with the time the feed started
+        self.started_at = datetime.now(timezone.utc)
+        self.touched_assets = set()
+        self._pending: List[PendingRow] = []
+
+    # Validate one parsed row; returns a full batch once batch_size is reached
+    def add(self, row: int, record: Optional[dict], error: Optional[str]) -> Optional[List[PendingRow]]:
+        if error is None:
+            try:
+                self._pending.append((row, TransactionIngestRow.model_validate(record)))
+            except ValidationError as exc:
+                error = describe_validation_error(exc)
+        if error is not None:
+            self.report.add_error(row, error)
+        if len(self._pending) >= self.batch_size:
+            return self.drain()
+        return None
+
+    # Whatever is pending, for the final partial batch
+    def drain(self) -> List[PendingRow]:
+        batch, self._pending = self._pending, []
+        return batch
+
+    def load_batch(self, session, batch: List[PendingRow]) -> None:
+        if batch:
+            rows = self._owned_rows(session, self._unique_rows(batch))
+            if session.get_bind().dialect.name == "postgresql":
+                inserted = self._copy_and_merge(session, rows)
+            else:
+                inserted = self._insert_new(session, rows)
+            self.report.imported += inserted
+            if inserted:
+                bump_version(session, self.user_id)
+            self.report.duplicates += len(rows) - inserted
+            self.batches += 1
+        if self.on_progress is not None:
+            self.on_progress(self.progress())
+
+    def finish(self, session) -> None:
+        if self.touched_assets:
+            rebuild_positions(session, self.user_id, self.touched_assets)
+
+    def progress(self) -> dict:
+        return {"batches": self.batches, "processed": self.report.processed, **self.report.as_dict()}
+
+    # The same external id twice in one batch: the first occurrence wins
+    def _unique_rows(self, batch: List[PendingRow]) -> List[PendingRow]:
+        seen = set()
+        rows = []
+        for row, item in batch:
+            if item.external_id in seen:
+                self.report.duplicates += 1
+                continue
+            seen.add(item.external_id)
+            rows.append((row, item))
+        return rows
+
+    # One IN query for every asset the batch references
+    def _owned_rows(self, session, batch: List[PendingRow]) -> List[PendingRow]:
+        asset_ids = {item.asset_id for _, item in batch if item.asset_id is not None}
+        owned = set()
+        if asset_ids:
+            owned = set(session.scalars(
+                select(Asset.id).join(Portfolio).where(
+                    Asset.id.in_(asset_ids),
+                    Portfolio.user_id == self.user_id,
+                )
+            ))
+        rows = []
+        for row, item in batch:
+            if item.asset_id is not None and item.asset_id not in owned:
+                self.report.add_error(row, "asset_id: Asset not found or doesn't belong to the user")
+                continue
+            rows.append((row, item))
+            if item.asset_id is not None:
+                self.touched_assets.add(item.asset_id)
+        return rows
+
+    def _values(self, item: TransactionIngestRow) -> tuple:
+        return (
+            item.transaction_type, item.amount, item.quantity, item.asset_id, self.user_id,
+            item.transaction_date or self.started_at, item.notes, item.external_id,
+        )
+
+    # PostgreSQL: COPY into the staging table, then one INSERT ... SELECT.
+    # NOT EXISTS skips rows already loaded without burning sequence values on
+    # a re-run; ON CONFLICT covers a concurrent ingest of the same feed.
+    def _copy_and_merge(self, session, rows: List[PendingRow]) -> int:
+        if not rows:
+            return 0
+        staging_table.create(session.connection())
+        copy_rows(session, staging_table, INGEST_COLUMNS, [self._values(item) for _, item in rows])
+        staged = staging_table.c
+        already_loaded = select(Transaction.id).where(
+            Transaction.user_id == staged.user_id,
+            Transaction.external_id == staged.external_id,
+        ).exists()
+        result = session.execute(
+            pg_insert(Transaction)
+            .from_select(
+                list(INGEST_COLUMNS),
+                select(*(staged[column] for column in INGEST_COLUMNS)).where(~already_loaded),
+            )
+            .on_conflict_do_nothing(index_elements=["user_id", "external_id"])
+        )
+        return result.rowcount
+
+    # Other databases: look up the batch's external ids, insert the rest
+    def _insert_new(self, session, rows: List[PendingRow]) -> int:
+        if not rows:
+            return 0
+        existing = set(session.scalars(
+            select(Transaction.external_id).where(
+                Transaction.user_id == self.user_id,
+                Transaction.external_id.in_([item.external_id for _, item in rows]),
+            )
+        ))
+        values = [
+            dict(zip(INGEST_COLUMNS, self._values(item)))
+            for _, item in rows if item.external_id not in existing
+        ]
+        if values:
+            session.execute(insert(Transaction), values)
+        return len(values)
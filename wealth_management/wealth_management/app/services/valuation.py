@@ -0,0 +1,77 @@
+from collections import defaultdict
+from typing import Iterable, Optional
+from sqlalchemy import func, select
+from ..models.models import Asset, Portfolio
+
+# Per-holding market value and cost basis as SQL expressions
+market_value_expr = func.coalesce(Asset.quantity, 0) * func.coalesce(Asset.current_price, 0)
+cost_basis_expr = func.coalesce(Asset.quantity, 0) * func.coalesce(Asset.purchase_price, 0)
+
+# Build the (portfolio, asset_type) aggregate query for a user's portfolios.
+# Portfolios are outer-joined so empty portfolios still produce a row with a
+# NULL asset_type, which lets callers tell "empty" apart from "not found".
+def allocation_query(user_id: int, portfolio_id: Optional[int] = None):
+    query = (
+        select(
+            Portfolio.id.label("portfolio_id"),
+            Asset.asset_type.label("asset_type"),
+            func.count(Asset.id).label("asset_count"),
+            func.coalesce(func.sum(market_value_expr), 0).label("market_value"),
+            func.coalesce(func.sum(cost_basis_expr), 0).label("cost_basis"),
+        )
+        .select_from(Portfolio)
+        .outerjoin(Asset, Asset.portfolio_id == Portfolio.id)
+        .where(Portfolio.user_id == user_id)
+        .group_by(Portfolio.id, Asset.asset_type)
+        .order_by(Portfolio.id, Asset.asset_type)
+    )
+    if portfolio_id is not None:
+        query = query.where(Portfolio.id == portfolio_id)
+    return query
+
+# Fold aggregate rows into a summary dict matching PortfolioSummaryResponse
+def summarize(rows: Iterable, portfolio_id: Optional[int] = None) -> dict:
+    by_type = defaultdict(lambda: {"asset_count": 0, "market_value": 0.0, "cost_basis": 0.0})
+    for row in rows:
+        if row.asset_type is None and not row.asset_count:
+            continue
+        bucket = by_type[row.asset_type or "other"]
+        bucket["asset_count"] += row.asset_count
+        bucket["market_value"] += float(row.market_value)
+        bucket["cost_basis"] += float(row.cost_basis)
+
+    market_value = sum(b["market_value"] for b in by_type.values())
+    cost_basis = sum(b["cost_basis"] for b in by_type.values())
+    allocation = [
+        {
+            "asset_type": asset_type,
+            "asset_count": b["asset_count"],
+            "market_value": b["market_value"],
+            "cost_basis": b["cost_basis"],
+            "unrealized_gain": b["market_value"] - b["cost_basis"],
+            "weight": b["market_value"] / market_value if market_value else 0.0,
+        }
+        for asset_type, b in sorted(by_type.items(), key=lambda item: -item[1]["market_value"])
+    ]
+    return {
+        "portfolio_id": portfolio_id,
+        "asset_count": sum(b["asset_count"] for b in by_type.values()),
+        "market_value": market_value,
+        "cost_basis": cost_basis,
+        "unrealized_gain": market_value - cost_basis,
+        "allocation": allocation,
+    }
+
+# Summaries for every portfolio plus the combined book
+def summarize_all(rows: Iterable) -> dict:
+    rows = list(rows)
+    per_portfolio = defaultdict(list)
+    for row in rows:
+        per_portfolio[row.portfolio_id].append(row)
+
+    summary = summarize(rows)
+    summary["portfolios"] = [
+        summarize(portfolio_rows, portfolio_id=portfolio_id)
+        for portfolio_id, portfolio_rows in per_portfolio.items()
+    ]
+    return summary
@@ -0,0 +1,15 @@
+from sqlalchemy import insert, literal, select
+from ..models.models import Portfolio
+
+# INSERT ... SELECT of one row whose parent id comes from `owner`, a select
+# of that id filtered down to parents the user owns. A missing or foreign
+# parent selects nothing, so nothing is inserted: the ownership check and
+# the write are a single statement, and an empty RETURNING means "not found".
+def insert_owned(model, parent_column: str, owner, values: dict):
+    table = model.__table__
+    row = owner.add_columns(*(literal(value, table.c[name].type) for name, value in values.items()))
+    return insert(model).from_select([parent_column, *values], row)
+
+# The id of the portfolio, if the user owns it
+def owned_portfolio(portfolio_id: int, user_id: int):
+    return select(Portfolio.id).where(Portfolio.id == portfolio_id, Portfolio.user_id == user_id)
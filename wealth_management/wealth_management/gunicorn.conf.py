@@ -0,0 +1,73 @@
+# Production server settings, picked up by running `gunicorn main:app` from
+# this directory: a gunicorn master managing uvicorn worker processes.
+#
+# Environment variables are read here before the app is imported, since the
+# app sizes its connection pools from WEB_CONCURRENCY and prometheus_client
+# reads PROMETHEUS_MULTIPROC_DIR at import time.
+import os
+import shutil
+import tempfile
+
+# Cores this process may run on; CPU affinity reflects cpusets and taskset,
+# which os.cpu_count() ignores
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# Configuration
+# One worker per available core unless WEB_CONCURRENCY says otherwise
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or available_cores())
+BIND = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+# Seconds a worker gets to finish its in-flight requests after SIGTERM
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+KEEPALIVE = int(os.getenv("KEEPALIVE", "5"))
+
+os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+# Every worker writes its metrics here and /metrics sums them. The default is
+# new for each master, so no samples from an earlier run get summed in; a
+# directory set from outside must be emptied before starting.
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="wealth-management-metrics-")
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = BIND
+workers = WEB_CONCURRENCY
+# uvicorn's worker picks uvloop and httptools when they are installed
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app once in the master and fork the workers from it, so they
+# share its memory and start without importing anything
+preload_app = True
+graceful_timeout = GRACEFUL_TIMEOUT
+keepalive = KEEPALIVE
+accesslog = "-"
+
+def when_ready(server):
+    from importlib.util import find_spec
+    server.log.info(
+        "Serving with %d workers, event loop %s, HTTP parser %s",
+        workers,
+        "uvloop" if find_spec("uvloop") else "asyncio",
+        "httptools" if find_spec("httptools") else "h11",
+    )
+
+# The preloaded app opens no connections, but a pool inherited through fork
+# must never be used by two processes, so each worker gets a fresh sync pool.
+# The async engine is left alone: the master has no event loop to connect it
+# from, and recreating its pool from sync code swaps the pool's asyncio-aware
+# first-connect lock for a thread lock, which deadlocks the worker when its
+# first requests arrive together.
+def post_fork(server, worker):
+    from app.db.database import engine
+    engine.dispose(close=False)
+
+# Drop a dead worker's gauges from the /metrics sums
+def child_exit(server, worker):
+    from app.services.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
+
+# Remove the default metrics directory on shutdown
+def on_exit(server):
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    if os.path.basename(directory).startswith("wealth-management-metrics-"):
+        shutil.rmtree(directory, ignore_errors=True)
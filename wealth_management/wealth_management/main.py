@@ -1,50 +1,94 @@
-import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth_router, users_router, portfolios_router, assets_router, goals_router, transactions_router, subscriptions
-from app.db.database import engine, Base
-
-# Create the database tables
-Base.metadata.create_all(bind=engine)
-
-# Create FastAPI application
-app = FastAPI(
-    title="Wealth Management API",
-    description="API for managing financial assets and tracking wealth growth",
-    version="1.0.0"
-)
-
-# Configure CORS
-origins = [
-    "http://localhost",
-    "http://localhost:3000",  # React frontend
-    "http://localhost:8000",  # FastAPI backend
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(auth_router)
-app.include_router(users_router)
-app.include_router(portfolios_router)
-app.include_router(assets_router)
-app.include_router(goals_router)
-app.include_router(transactions_router)
-app.include_router(subscriptions.router)
-
-@app.get("/")
-async def root():
-    return {
-        "message": "Welcome to the Wealth Management API",
-        "docs": "/docs",
-        "redoc": "/redoc"
-    }
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.db.database import async_engine, create_schema, engine
+from app.db.statements import REQUEST_STATS, STATEMENTS_HEADER, RequestStatsMiddleware
+from app.services.metrics import MetricsMiddleware, instrument_pool
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.passwords import password_hasher
+
+# Startup does no DDL unless DB_CREATE_ALL is set (the schema is Alembic's),
+# so a worker starts as fast as it imports, whether or not the database is up
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.db_create_all:
+        await run_in_threadpool(create_schema)
+    yield
+    if async_engine is not None:
+        await async_engine.dispose()
+    await run_in_threadpool(engine.dispose)
+    await run_in_threadpool(password_hasher.shutdown)
+
+# Create the FastAPI application. Configuration comes from the environment
+# only (app.config.settings, read once at import): the engines and their
+# pools are built when app.db.database is imported, so there is nothing to
+# pass in per app.
+def create_app() -> FastAPI:
+    from app.routers import auth_router, users_router, portfolios_router, assets_router, goals_router, transactions_router, dashboard_router, internal_router, metrics_router, subscriptions
+
+    # Pool gauges for /metrics, counted from the very first connection
+    if settings.metrics_enabled:
+        instrument_pool(engine, "sync")
+        if async_engine is not None:
+            instrument_pool(async_engine.sync_engine, "async")
+
+    app = FastAPI(
+        title="Wealth Management API",
+        description="API for managing financial assets and tracking wealth growth",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    # Per-request statement count, DB time and Server-Timing, plus the N+1
+    # check (see app.db.statements)
+    if REQUEST_STATS:
+        app.add_middleware(RequestStatsMiddleware)
+
+    # Prometheus metrics, served at /metrics
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag", STATEMENTS_HEADER, "Server-Timing"],
+    )
+
+    # Include routers
+    app.include_router(auth_router)
+    app.include_router(users_router)
+    app.include_router(portfolios_router)
+    app.include_router(assets_router)
+    app.include_router(goals_router)
+    app.include_router(transactions_router)
+    app.include_router(dashboard_router)
+    app.include_router(subscriptions.router)
+    app.include_router(internal_router)
+    if settings.metrics_enabled:
+        app.include_router(metrics_router)
+
+    @app.get("/")
+    async def root():
+        return {
+            "message": "Welcome to the Wealth Management API",
+            "docs": "/docs",
+            "redoc": "/redoc"
+        }
+
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    import os
+    import uvicorn
+    # The dev server creates missing tables unless told otherwise; the
+    # reloader's child process inherits this
+    os.environ.setdefault("DB_CREATE_ALL", "true")
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,157 @@
+"""Load-test the API and compare against a stored baseline.
+
+Logs in as --users users seeded by scripts.seed_data and, one endpoint at a
+time, keeps --concurrency async clients sending requests as those users
+until --requests have completed. Requests go through the real app in this
+process, or to a running server with --url. Reports throughput and p50, p95
+and p99 latency per endpoint.
+
+--save writes the results as a baseline. --baseline compares against one and
+exits 1 when any endpoint's p95 grew, or its throughput fell, by more than
+--threshold. Baselines are only comparable on the same machine, database and
+dataset.
+
+    python -m scripts.bench_endpoints [--requests 500] [--concurrency 16] [--save FILE | --baseline FILE]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import httpx
+import numpy as np
+from sqlalchemy import select
+from app.db.database import SessionLocal
+from app.models.models import User
+
+# The transactions list twice: a full default page (100 rows) and the small
+# page a client scrolling through history asks for
+ENDPOINTS = (
+    "/portfolios/",
+    "/portfolios/summary",
+    "/assets/",
+    "/goals/",
+    "/transactions/",
+    "/transactions/?limit=20",
+    "/dashboard",
+)
+
+# Emails of up to `count` seeded users, picked at random but repeatably
+def seeded_emails(prefix: str, count: int, seed: int):
+    with SessionLocal() as session:
+        emails = session.scalars(select(User.email).where(User.email.like(f"{prefix}%")).order_by(User.id)).all()
+    return random.Random(seed).sample(emails, min(count, len(emails)))
+
+def client(url):
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+    from main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+async def login(http, emails, password: str):
+    headers = []
+    for email in emails:
+        response = await http.post("/auth/token", data={"username": email, "password": password})
+        response.raise_for_status()
+        headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+    return headers
+
+# Run `requests` GETs of `path` from `concurrency` workers, each request as a
+# random user; latencies in seconds and the number of non-2xx responses
+async def run_endpoint(http, path: str, users, requests: int, concurrency: int, seed: int):
+    pick = random.Random(seed)
+    remaining = requests
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            headers = pick.choice(users)
+            started = time.perf_counter()
+            response = await http.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            errors += not response.is_success
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+def summarize(latencies, errors: int, seconds: float) -> dict:
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
+
+async def bench(args) -> dict:
+    emails = seeded_emails(args.prefix, args.users, args.seed)
+    if not emails:
+        raise SystemExit(f"No users with emails starting {args.prefix!r}; run scripts.seed_data first")
+    results = {}
+    async with client(args.url) as http:
+        users = await login(http, emails, args.password)
+        for path in args.endpoint or ENDPOINTS:
+            # Warm caches, pools and the token cache before measuring
+            await run_endpoint(http, path, users, args.warmup, args.concurrency, args.seed)
+            results[path] = summarize(*await run_endpoint(http, path, users, args.requests, args.concurrency, args.seed))
+    return results
+
+# Endpoints that regressed past `threshold` against `baseline`, with why
+def regressions(results: dict, baseline: dict, threshold: float) -> dict:
+    found = {}
+    for path, result in results.items():
+        before = baseline.get(path)
+        if before is None:
+            continue
+        reasons = []
+        if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            reasons.append(f"p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if result["rps"] < before["rps"] * (1 - threshold):
+            reasons.append(f"throughput {before['rps']} -> {result['rps']} req/s")
+        if result["errors"] > before["errors"]:
+            reasons.append(f"errors {before['errors']} -> {result['errors']}")
+        if reasons:
+            found[path] = reasons
+    return found
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="a running server; default is the app in this process")
+    parser.add_argument("--endpoint", action="append", help="path to benchmark; repeatable, default all")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=20, help="seeded users to spread requests over")
+    parser.add_argument("--prefix", default="seed-")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", default=None, help="write the results to this baseline file")
+    parser.add_argument("--baseline", default=None, help="compare against this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 is 20%%")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(bench(args))
+    print(f"{'endpoint':<28} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for path, result in results.items():
+        print(f"{path:<28} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8} "
+              f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8}")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            found = regressions(results, json.load(file), args.threshold)
+        for path, reasons in found.items():
+            print(f"REGRESSION  {path}: {', '.join(reasons)}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Compare the ORM and lean paths of the list endpoints.
+
+For each list endpoint, loads one page for the user with the most rows behind
+it (or the given user) and serializes it both ways. The ORM path loads full
+instances, validates them through the response model and encodes with json,
+the way FastAPI handles a returned model. The lean path selects the response
+columns through Core and encodes with orjson.
+Reports the median and p95 latency of each, and the peak memory traced while
+one page is serialized.
+
+    python -m scripts.bench_list_serialization [--user-id N] [--rows 1000] [--repeat 30]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from app.db.database import SessionLocal
+from app.models.models import Asset, FinancialGoal, Portfolio, Transaction
+from app.models.schemas import AssetResponse, FinancialGoalResponse, PortfolioResponse, TransactionResponse
+from app.services.responses import lean_response, response_columns
+
+# (model, response schema, owner column, order) for each list endpoint;
+# assets are owned through their portfolio
+ENDPOINTS = {
+    "GET /portfolios/": (Portfolio, PortfolioResponse, Portfolio.user_id, (Portfolio.id,)),
+    "GET /assets/": (Asset, AssetResponse, Portfolio.user_id, (Asset.id,)),
+    "GET /goals/": (FinancialGoal, FinancialGoalResponse, FinancialGoal.user_id, (FinancialGoal.id,)),
+    "GET /transactions/": (Transaction, TransactionResponse, Transaction.user_id,
+                           (Transaction.transaction_date.desc(), Transaction.id.desc())),
+}
+
+def owned(query, endpoint, user_id: int):
+    model, _, owner, _ = ENDPOINTS[endpoint]
+    if model is Asset:
+        query = query.join(Portfolio)
+    return query.where(owner == user_id)
+
+def orm_page(session, endpoint, user_id: int, rows: int) -> bytes:
+    model, schema, _, order = ENDPOINTS[endpoint]
+    instances = session.scalars(owned(select(model), endpoint, user_id).order_by(*order).limit(rows)).all()
+    adapter = TypeAdapter(List[schema])
+    content = adapter.dump_python(adapter.validate_python(instances, from_attributes=True), mode="json")
+    session.expunge_all()
+    return JSONResponse(content).body
+
+def lean_page(session, endpoint, user_id: int, rows: int) -> bytes:
+    model, schema, _, order = ENDPOINTS[endpoint]
+    result = session.execute(owned(select(*response_columns(model, schema)), endpoint, user_id).order_by(*order).limit(rows))
+    return lean_response(result, Response()).body
+
+def measure(page, session, endpoint, user_id: int, rows: int, repeat: int) -> dict:
+    page(session, endpoint, user_id, rows)  # warm up caches and the connection
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = page(session, endpoint, user_id, rows)
+        timings.append((time.perf_counter() - started) * 1000)
+        session.rollback()
+    tracemalloc.start()
+    page(session, endpoint, user_id, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    session.rollback()
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        "peak_kib": round(peak / 1024, 1),
+        "rows": len(json.loads(body)),
+    }
+
+# The user with the most rows behind an endpoint, so pages are full
+def busiest_user(session, endpoint) -> int:
+    model, _, owner, _ = ENDPOINTS[endpoint]
+    query = select(owner).select_from(model)
+    if model is Asset:
+        query = query.join(Portfolio)
+    return session.scalar(query.group_by(owner).order_by(func.count().desc()).limit(1))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as session:
+        print(f"up to {args.rows} rows per page, {args.repeat} runs")
+        print(f"{'endpoint':<20} {'user':>6} {'path':<5} {'rows':>5} {'median ms':>10} {'p95 ms':>8} {'peak KiB':>9}")
+        for endpoint in ENDPOINTS:
+            user_id = args.user_id or busiest_user(session, endpoint)
+            if user_id is None:
+                continue
+            for name, page in (("orm", orm_page), ("lean", lean_page)):
+                result = measure(page, session, endpoint, user_id, args.rows, args.repeat)
+                print(f"{endpoint:<20} {user_id:>6} {name:<5} {result['rows']:>5} {result['median_ms']:>10} {result['p95_ms']:>8} {result['peak_kib']:>9}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
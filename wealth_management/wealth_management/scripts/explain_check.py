@@ -0,0 +1,105 @@
+"""Check that the router queries are served by indexes.
+
+Runs EXPLAIN (FORMAT JSON) for the per-user queries the routers issue against
+a seeded Postgres database and fails if any of them sequentially scans one of
+the per-user tables.
+
+    python -m scripts.explain_check [--user-id N] [--force-index]
+
+--force-index disables sequential scans for the session, which checks that a
+usable index exists even on a small development database where the planner
+would rightly prefer a seq scan.
+"""
+import argparse
+import json
+import sys
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+from app.db.database import engine
+from app.models.models import Asset, FinancialGoal, Portfolio, Transaction
+from app.models.schemas import AssetResponse, FinancialGoalResponse, PortfolioResponse, TransactionResponse
+from app.services.responses import response_columns
+from app.services.valuation import allocation_query
+
+# Tables that must never be read with a Seq Scan by a per-user query
+CHECKED_TABLES = {"portfolios", "assets", "financial_goals", "transactions"}
+PAGE = 101
+
+def router_queries(user_id: int, asset_id: int):
+    return {
+        "GET /portfolios/": select(*response_columns(Portfolio, PortfolioResponse)).where(Portfolio.user_id == user_id)
+            .order_by(Portfolio.id).limit(PAGE),
+        "GET /portfolios/summary": allocation_query(user_id),
+        "GET /assets/": select(*response_columns(Asset, AssetResponse)).join(Portfolio).where(Portfolio.user_id == user_id)
+            .order_by(Asset.id).limit(PAGE),
+        "GET /goals/": select(*response_columns(FinancialGoal, FinancialGoalResponse)).where(FinancialGoal.user_id == user_id)
+            .order_by(FinancialGoal.id).limit(PAGE),
+        "GET /transactions/": select(*response_columns(Transaction, TransactionResponse)).where(Transaction.user_id == user_id)
+            .order_by(Transaction.transaction_date.desc(), Transaction.id.desc()).limit(PAGE),
+        "GET /transactions/?asset_id=": select(*response_columns(Transaction, TransactionResponse)).where(
+            Transaction.user_id == user_id, Transaction.asset_id == asset_id)
+            .order_by(Transaction.transaction_date.desc(), Transaction.id.desc()).limit(PAGE),
+    }
+
+# Yield every node of a JSON plan tree
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+def explain(connection, statement):
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+# The busiest user and asset give the planner the least reason to seq scan
+def pick_ids(connection, user_id=None):
+    if user_id is None:
+        user_id = connection.execute(
+            select(Transaction.user_id).group_by(Transaction.user_id)
+            .order_by(func.count().desc()).limit(1)
+        ).scalar()
+    asset_id = connection.execute(
+        select(Transaction.asset_id).where(Transaction.user_id == user_id, Transaction.asset_id.isnot(None))
+        .group_by(Transaction.asset_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    return user_id, asset_id or 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--force-index", action="store_true")
+    args = parser.parse_args(argv)
+
+    if engine.dialect.name != "postgresql":
+        print(f"explain_check needs PostgreSQL, not {engine.dialect.name}", file=sys.stderr)
+        return 2
+
+    failures = 0
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        if args.force_index:
+            connection.execute(text("SET enable_seqscan = off"))
+        user_id, asset_id = pick_ids(connection, args.user_id)
+        if user_id is None:
+            print("No transactions found; seed the database first", file=sys.stderr)
+            return 2
+
+        for name, statement in router_queries(user_id, asset_id).items():
+            scans = [
+                (node["Node Type"], node.get("Relation Name"), node.get("Index Name"))
+                for node in walk(explain(connection, statement))
+                if node.get("Relation Name") in CHECKED_TABLES
+            ]
+            seq_scans = [scan for scan in scans if scan[0] == "Seq Scan"]
+            failures += bool(seq_scans)
+            print(f"{'FAIL' if seq_scans else 'ok  '}  {name}")
+            for node_type, relation, index in scans:
+                print(f"        {node_type} on {relation}" + (f" using {index}" if index else ""))
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
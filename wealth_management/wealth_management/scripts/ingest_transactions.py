@@ -0,0 +1,58 @@
+"""Ingest a custodian transaction feed for one user.
+
+Streams a CSV or JSON Lines file into the user's transactions through the
+same batched loader as POST /transactions/ingest, printing progress after
+every batch. Every row needs an external_id; rows already loaded for the user
+are skipped, so an interrupted run can simply be started again.
+
+    python -m scripts.ingest_transactions --user-id N FILE [--format csv|jsonl] [--batch-size N]
+"""
+import argparse
+import json
+import sys
+import time
+from app.db.database import SessionLocal
+from app.services.records import CSV, JSONL, parse_records
+from app.services.transaction_ingest import INGEST_BATCH_SIZE, TransactionIngestor
+
+def print_progress(started: float):
+    def report(progress: dict):
+        elapsed = time.perf_counter() - started
+        rate = progress["processed"] / elapsed if elapsed else 0.0
+        print(
+            f"batch {progress['batches']}: {progress['processed']} rows "
+            f"({progress['imported']} new, {progress['duplicates']} duplicate, "
+            f"{progress['failed']} failed) {rate:,.0f} rows/s",
+            file=sys.stderr,
+        )
+    return report
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=[CSV, JSONL], default=None,
+                        help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or (JSONL if args.file.endswith((".jsonl", ".ndjson")) else CSV)
+    ingestor = TransactionIngestor(args.user_id, args.batch_size, print_progress(time.perf_counter()))
+
+    with SessionLocal() as session, open(args.file, newline="", encoding="utf-8-sig") as lines:
+        for row, record, error in parse_records(lines, fmt):
+            batch = ingestor.add(row, record, error)
+            if batch:
+                ingestor.load_batch(session, batch)
+                session.commit()
+        ingestor.load_batch(session, ingestor.drain())
+        session.commit()
+        ingestor.finish(session)
+        session.commit()
+
+    json.dump(ingestor.report.as_dict(), sys.stdout, indent=2)
+    print()
+    return 1 if ingestor.report.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
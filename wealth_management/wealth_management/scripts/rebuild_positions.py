@@ -0,0 +1,37 @@
+"""Rebuild the positions table from the transaction ledger.
+
+Replays every transaction (or one user's) and replaces the stored positions
+in a single transaction. With --check nothing is written: positions that
+differ from the replay are printed and the exit status is 1 if any do.
+
+    python -m scripts.rebuild_positions [--user-id N] [--check]
+"""
+import argparse
+import json
+import sys
+from app.db.database import SessionLocal
+from app.services.positions import check_positions, rebuild_positions
+
+def print_drift(drift: dict):
+    print(json.dumps(drift, default=str), file=sys.stderr)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--check", action="store_true",
+                        help="report drift without writing")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as session:
+        if args.check:
+            report = check_positions(session, args.user_id, print_drift)
+        else:
+            report = rebuild_positions(session, args.user_id)
+            session.commit()
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 1 if report.get("drifted") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
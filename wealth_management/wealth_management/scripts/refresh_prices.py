@@ -0,0 +1,46 @@
+"""Reprice every holding from a price source.
+
+Walks the distinct ticker symbols across all assets in batches, quotes each
+batch and applies it with one set-based UPDATE in its own short transaction.
+Assets without a quote keep their current price.
+
+    python -m scripts.refresh_prices [--source file:prices.csv] [--batch-size N]
+
+The source defaults to PRICE_SOURCE. A file source reads a CSV with ticker
+and price columns, or a JSON object mapping ticker to price.
+"""
+import argparse
+import json
+import sys
+from app.db.database import SessionLocal
+from app.services.pricing import PRICE_BATCH_SIZE, PRICE_SOURCE, get_price_source, refresh_prices
+
+def print_progress(progress: dict):
+    print(
+        f"batch {progress['batches']}: {progress['tickers']} tickers, "
+        f"{progress['quoted']} quoted, {progress['updated']} holdings updated "
+        f"({progress['seconds']:.1f}s)",
+        file=sys.stderr,
+    )
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=PRICE_SOURCE, help="e.g. file:prices.csv")
+    parser.add_argument("--batch-size", type=int, default=PRICE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        source = get_price_source(args.source)
+    except (ValueError, OSError) as exc:
+        print(exc, file=sys.stderr)
+        return 2
+
+    with SessionLocal() as session:
+        report = refresh_prices(session, source, args.batch_size, print_progress)
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Seed the database with a synthetic dataset for benchmarks.
+
+Creates --users users with portfolios, assets, goals and, between them,
+--transactions transactions. Sizes follow a Pareto distribution (--skew; the
+default 1.16 gives each fifth of users about four fifths of the data), so a
+few users hold long ledgers and most hold short ones. Sells never exceed the
+units held and dates run forward per asset, so the P&L and position code sees
+a consistent ledger. Rows are bulk loaded (COPY on PostgreSQL) in batches of
+--batch-size and positions are rebuilt for the seeded users afterwards.
+
+Every seeded user logs in with --password and has an email starting with
+--prefix, which is what scripts.bench_endpoints looks for. The same --seed
+gives the same data; only the emails differ between runs.
+
+    python -m scripts.seed_data [--users 1000] [--transactions 1000000] [--skew 1.16] [--seed 7]
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import func, select
+from app.db.bulk import copy_rows
+from app.config import settings
+from app.db.database import SessionLocal, create_schema
+from app.models.models import Asset, FinancialGoal, Portfolio, Transaction, User
+from app.services.passwords import pwd_context
+from app.services.positions import rebuild_positions
+
+ASSET_TYPES = ("stock", "etf", "bond", "crypto", "real_estate", "cash")
+PRIORITIES = ("high", "medium", "low")
+# Share of ledger entries of each kind; cash movements carry no asset
+KINDS = ("buy", "sell", "dividend", "deposit", "withdrawal")
+KIND_WEIGHTS = (0.45, 0.2, 0.15, 0.15, 0.05)
+HISTORY_START = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+USER_COLUMNS = ("email", "hashed_password", "first_name", "last_name", "is_active")
+PORTFOLIO_COLUMNS = ("name", "description", "user_id")
+ASSET_COLUMNS = ("name", "asset_type", "ticker_symbol", "quantity", "purchase_price", "current_price", "purchase_date", "portfolio_id")
+GOAL_COLUMNS = ("name", "description", "target_amount", "current_amount", "target_date", "priority", "user_id")
+TRANSACTION_COLUMNS = ("transaction_type", "amount", "quantity", "asset_id", "user_id", "transaction_date", "notes")
+
+# Bulk load `rows` in batches, committing each so the load never holds one
+# huge transaction
+def load(session, model, columns, rows, batch_size: int) -> int:
+    batch, loaded = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            loaded += copy_rows(session, model.__table__, columns, batch)
+            session.commit()
+            batch = []
+    loaded += copy_rows(session, model.__table__, columns, batch)
+    session.commit()
+    return loaded
+
+# Per-user share of the data, Pareto distributed and summing to one
+def user_weights(rng, users: int, skew: float):
+    weights = rng.pareto(skew, users) + 1.0
+    return weights / weights.sum()
+
+# Ids of the users seeded by this run, as a subquery; a literal list of
+# ids would overflow SQLite's parameter limit
+def seeded_users(args, run: str):
+    return select(User.id).where(User.email.like(f"{args.prefix}{run}-%"))
+
+def seed_users(session, rng, args, run: str):
+    hashed = pwd_context.hash(args.password)
+    rows = (
+        (f"{args.prefix}{run}-{index}@example.com", hashed, "Seed", f"User {index}", True)
+        for index in range(args.users)
+    )
+    load(session, User, USER_COLUMNS, rows, args.batch_size)
+    return session.scalars(seeded_users(args, run).order_by(User.id)).all()
+
+def seed_portfolios(session, rng, args, user_ids, seeded, scale):
+    counts = np.clip(1 + np.sqrt(scale).round(), 1, 10).astype(int)
+    rows = (
+        (f"Portfolio {number + 1}", None, user_id)
+        for user_id, count in zip(user_ids, counts) for number in range(count)
+    )
+    load(session, Portfolio, PORTFOLIO_COLUMNS, rows, args.batch_size)
+    portfolios = {}
+    for portfolio_id, user_id in session.execute(
+        select(Portfolio.id, Portfolio.user_id).where(Portfolio.user_id.in_(seeded)).order_by(Portfolio.id)
+    ):
+        portfolios.setdefault(user_id, []).append(portfolio_id)
+    return portfolios
+
+def seed_assets(session, rng, args, user_ids, seeded, scale, portfolios):
+    counts = np.clip(rng.poisson(8 * scale), 1, 500)
+
+    def rows():
+        for user_id, count in zip(user_ids, counts):
+            owned = portfolios[user_id]
+            for number in range(count):
+                price = float(rng.lognormal(4, 1))
+                kind = ASSET_TYPES[rng.integers(len(ASSET_TYPES))]
+                yield (
+                    f"Asset {number + 1}", kind, f"S{rng.integers(10_000):04d}" if kind != "cash" else None,
+                    float(rng.integers(1, 500)), price, price * float(rng.lognormal(0.05, 0.3)),
+                    HISTORY_START + timedelta(days=int(rng.integers(3650))), owned[rng.integers(len(owned))],
+                )
+
+    load(session, Asset, ASSET_COLUMNS, rows(), args.batch_size)
+    assets = {}
+    for asset_id, user_id, price in session.execute(
+        select(Asset.id, Portfolio.user_id, Asset.purchase_price).join(Portfolio)
+        .where(Portfolio.user_id.in_(seeded)).order_by(Asset.id)
+    ):
+        assets.setdefault(user_id, []).append((asset_id, price))
+    return assets
+
+def seed_goals(session, rng, args, user_ids):
+    now = datetime.now(timezone.utc)
+
+    def rows():
+        for user_id in user_ids:
+            for number in range(int(rng.integers(0, 6))):
+                target = float(rng.integers(1, 200)) * 5_000
+                yield (
+                    f"Goal {number + 1}", None, target, target * float(rng.random()),
+                    now + timedelta(days=int(rng.integers(180, 30 * 365))), PRIORITIES[rng.integers(3)], user_id,
+                )
+
+    return load(session, FinancialGoal, GOAL_COLUMNS, rows(), args.batch_size)
+
+# One user's ledger, oldest first: buys and sells at a price drifting around
+# each asset's purchase price, sells capped at the units held
+def ledger(rng, user_id: int, count: int, assets):
+    now = datetime.now(timezone.utc)
+    span = (now - HISTORY_START).total_seconds()
+    offsets = np.sort(rng.random(count)) * span
+    kinds = rng.choice(len(KINDS), size=count, p=KIND_WEIGHTS)
+    picks = rng.integers(len(assets), size=count)
+    moves = rng.normal(0, 0.05, size=count)
+    held = {}
+    prices = {asset_id: price for asset_id, price in assets}
+
+    for offset, kind, pick, move in zip(offsets, kinds, picks, moves):
+        date = HISTORY_START + timedelta(seconds=float(offset))
+        kind = KINDS[kind]
+        if kind in ("deposit", "withdrawal"):
+            yield (kind, float(rng.integers(1, 200)) * 50, None, None, user_id, date, None)
+            continue
+        asset_id = assets[pick][0]
+        prices[asset_id] = price = max(prices[asset_id] * (1 + float(move)), 0.01)
+        units = held.get(asset_id, 0.0)
+        if kind in ("sell", "dividend") and units <= 0:
+            kind = "buy"
+        if kind == "dividend":
+            yield (kind, round(units * price * 0.01, 2), None, asset_id, user_id, date, None)
+        elif kind == "buy":
+            quantity = float(rng.integers(1, 50))
+            held[asset_id] = units + quantity
+            yield (kind, round(quantity * price, 2), quantity, asset_id, user_id, date, None)
+        else:
+            quantity = min(units, float(rng.integers(1, 50)))
+            held[asset_id] = units - quantity
+            yield (kind, round(quantity * price, 2), quantity, asset_id, user_id, date, None)
+
+def seed_transactions(session, rng, args, user_ids, weights, assets):
+    counts = rng.multinomial(args.transactions, weights)
+    rows = (row for user_id, count in zip(user_ids, counts) for row in ledger(rng, user_id, count, assets[user_id]))
+    return load(session, Transaction, TRANSACTION_COLUMNS, rows, args.batch_size)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=1_000_000, help="total across all users")
+    parser.add_argument("--skew", type=float, default=1.16, help="Pareto shape; lower is more skewed")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--prefix", default="seed-", help="email prefix of the seeded users")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    # Same bootstrap as app startup, for a fresh development database
+    if settings.db_create_all:
+        create_schema()
+    rng = np.random.default_rng(args.seed)
+    # Emails stay unique when seeding the same database twice
+    run = uuid.uuid4().hex[:6]
+    weights = user_weights(rng, args.users, args.skew)
+    scale = weights * args.users
+    started = time.perf_counter()
+    report = {}
+
+    with SessionLocal() as session:
+        user_ids = seed_users(session, rng, args, run)
+        seeded = seeded_users(args, run)
+        portfolios = seed_portfolios(session, rng, args, user_ids, seeded, scale)
+        assets = seed_assets(session, rng, args, user_ids, seeded, scale, portfolios)
+        report["users"] = len(user_ids)
+        report["portfolios"] = sum(len(owned) for owned in portfolios.values())
+        report["assets"] = sum(len(owned) for owned in assets.values())
+        report["goals"] = seed_goals(session, rng, args, user_ids)
+        report["transactions"] = seed_transactions(session, rng, args, user_ids, weights, assets)
+        for user_id in user_ids:
+            rebuild_positions(session, user_id)
+            session.commit()
+        largest = session.execute(
+            select(User.email, func.count(Transaction.id)).join(Transaction, Transaction.user_id == User.id)
+            .where(User.id.in_(seeded)).group_by(User.email).order_by(func.count(Transaction.id).desc()).limit(1)
+        ).first()
+
+    report["largest_user"] = {"email": largest[0], "transactions": largest[1]} if largest else None
+    report["seconds"] = round(time.perf_counter() - started, 1)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""Record today's valuation for every portfolio that changed.
+
+Run once a day, after the price refresh. Portfolios whose totals match their
+latest snapshot are skipped; running again on the same day overwrites that
+day's snapshots.
+
+    python -m scripts.snapshot_portfolios [--date YYYY-MM-DD]
+"""
+import argparse
+import sys
+from datetime import date
+from app.db.database import SessionLocal
+from app.services.snapshots import take_snapshots
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="snapshot day, defaults to today")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as session:
+        written = take_snapshots(session, args.date)
+        session.commit()
+
+    print(f"{written} portfolio snapshots written for {args.date or date.today()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
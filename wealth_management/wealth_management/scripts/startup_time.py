@@ -0,0 +1,75 @@
+"""Measure how long a fresh process takes to start serving.
+
+Each of --runs fresh interpreters imports main (the application factory and
+everything it pulls in), runs the app's startup hooks and serves GET / in
+process. Reports the median and fastest import time and time to first
+response. Startup does no database I/O unless DB_CREATE_ALL is set, so this
+works, and should give the same numbers, with the database down.
+
+--top N also lists the N slowest imports of one run, from -X importtime.
+
+    python -m scripts.startup_time [--runs 5] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Run in each child; prints its timings as JSON on the last line
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def first_response():
+    import httpx
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as http:
+            (await http.get("/")).raise_for_status()
+        return time.perf_counter()
+
+served = asyncio.run(first_response())
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_response_ms": (served - started) * 1000}))
+"""
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def probe(extra_args=()) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-W", "ignore", *extra_args, "-c", PROBE],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+
+# Slowest imports by cumulative time from -X importtime output
+def slowest_imports(stderr: str, top: int):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative) / 1000, name.rstrip()))
+    return sorted(imports, reverse=True)[:top]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="list the N slowest imports")
+    args = parser.parse_args(argv)
+
+    timings = [json.loads(probe().stdout.splitlines()[-1]) for _ in range(args.runs)]
+    for key in ("import_ms", "first_response_ms"):
+        values = [timing[key] for timing in timings]
+        print(f"{key:<18} median {statistics.median(values):8.1f}   min {min(values):8.1f}")
+
+    if args.top:
+        print(f"\n{'cumulative ms':>13}  module")
+        for ms, name in slowest_imports(probe(("-X", "importtime")).stderr, args.top):
+            print(f"{ms:>13.1f}  {name}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
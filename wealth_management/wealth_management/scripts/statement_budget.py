@@ -0,0 +1,124 @@
+"""Check how many SQL statements each write endpoint sends.
+
+Registers a throwaway user and drives every create, update and delete
+endpoint once through the app, reading the X-DB-Statements header that
+DB_COUNT_STATEMENTS adds. Fails if any request sends more statements than
+its budget, which catches a write that has grown a separate ownership read,
+a refresh or a lazy load. The user is left behind, without any data.
+
+    python -m scripts.statement_budget [--verbose]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+
+os.environ["DB_COUNT_STATEMENTS"] = "true"
+
+import httpx
+from app.db.statements import STATEMENTS_HEADER
+from main import app
+
+# Most statements each request may send. The aim is one statement per write:
+# ownership checks, defaults and the response all come from a single
+# INSERT ... SELECT / UPDATE / DELETE ... RETURNING. Writes that change a
+# user's data then bump that user's data version (app.services.data_versions)
+# in a separate one-row upsert. Folding the bump into the write would take a
+# data-modifying CTE, which SQLite does not have, or triggers that
+# DB_CREATE_ALL schemas would lack; one code path for both backends is worth
+# the extra statement, sent just before COMMIT so its row lock is brief.
+BUDGETS = {
+    # The insert; a new user has no data to version yet
+    "POST /users/": 1,
+    # Profile fields are not part of any versioned response
+    "PUT /users/me": 1,
+    # The write, then the version bump
+    "POST /portfolios/": 2,
+    "PUT /portfolios/{id}": 2,
+    "POST /assets/": 2,
+    "PUT /assets/{id}": 2,
+    "POST /goals/": 2,
+    "PUT /goals/{id}": 2,
+    "PATCH /goals/{id}/progress": 2,
+    # No asset, so no position to maintain
+    "POST /transactions/": 2,
+    # The insert, creating the position if missing, locking it (SELECT ...
+    # FOR UPDATE), the position UPDATE, the bump
+    "POST /transactions/ with asset": 5,
+    # The delete, creating and locking the position, replaying the asset's
+    # remaining ledger, dropping positions left without one, the bump. This
+    # deletes the asset's only transaction; with others left, the replayed
+    # position is also upserted, making 7.
+    "DELETE /transactions/{id}": 6,
+    "DELETE /goals/{id}": 2,
+    "DELETE /assets/{id}": 2,
+    # Unassigning its assets (they outlive it), the delete, the bump
+    "DELETE /portfolios/{id}": 3,
+}
+
+# Statements sent by each request in BUDGETS
+async def measure() -> dict:
+    counts = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+
+        async def call(name, method, url, **kwargs):
+            response = await client.request(method, url, **kwargs)
+            if response.status_code >= 400:
+                raise SystemExit(f"{name}: {response.status_code} {response.text}")
+            counts[name] = int(response.headers[STATEMENTS_HEADER])
+            return response.json() if response.content else None
+
+        email, password = f"budget-{uuid.uuid4().hex[:12]}@example.com", uuid.uuid4().hex
+        await call("POST /users/", "POST", "/users/", json={
+            "email": email, "password": password, "first_name": "Statement", "last_name": "Budget",
+        })
+        token = (await client.post("/auth/token", data={"username": email, "password": password})).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        # Warm the token cache, so authentication sends nothing below
+        await client.get("/users/me")
+
+        await call("PUT /users/me", "PUT", "/users/me", params={"first_name": "Checked"})
+        await client.get("/users/me")
+        portfolio = await call("POST /portfolios/", "POST", "/portfolios/", json={"name": "Budget"})
+        await call("PUT /portfolios/{id}", "PUT", f"/portfolios/{portfolio['id']}", json={"name": "Budget", "description": "Checked"})
+        asset = {
+            "name": "Budget", "asset_type": "stock", "ticker_symbol": "BDGT", "quantity": 1,
+            "purchase_price": 10, "current_price": 10, "purchase_date": "2024-01-01T00:00:00",
+            "portfolio_id": portfolio["id"],
+        }
+        asset_id = (await call("POST /assets/", "POST", "/assets/", json=asset))["id"]
+        await call("PUT /assets/{id}", "PUT", f"/assets/{asset_id}", json={**asset, "current_price": 12})
+        goal = {"name": "Budget", "target_amount": 100, "target_date": "2030-01-01T00:00:00", "priority": "low"}
+        goal_id = (await call("POST /goals/", "POST", "/goals/", json=goal))["id"]
+        await call("PUT /goals/{id}", "PUT", f"/goals/{goal_id}", json={**goal, "target_amount": 200})
+        await call("PATCH /goals/{id}/progress", "PATCH", f"/goals/{goal_id}/progress", params={"current_amount": 50})
+        cash_id = (await call("POST /transactions/", "POST", "/transactions/", json={"transaction_type": "deposit", "amount": 10}))["id"]
+        transaction_id = (await call("POST /transactions/ with asset", "POST", "/transactions/", json={
+            "transaction_type": "buy", "amount": 10, "quantity": 1, "asset_id": asset_id,
+        }))["id"]
+        await call("DELETE /transactions/{id}", "DELETE", f"/transactions/{transaction_id}")
+        await client.delete(f"/transactions/{cash_id}")
+        await call("DELETE /goals/{id}", "DELETE", f"/goals/{goal_id}")
+        await call("DELETE /assets/{id}", "DELETE", f"/assets/{asset_id}")
+        await call("DELETE /portfolios/{id}", "DELETE", f"/portfolios/{portfolio['id']}")
+    return counts
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="print every endpoint, not only failures")
+    args = parser.parse_args(argv)
+
+    counts = asyncio.run(measure())
+    failures = 0
+    for name, budget in BUDGETS.items():
+        over = counts[name] > budget
+        failures += over
+        if over or args.verbose:
+            print(f"{'FAIL' if over else 'ok  '}  {name:<32} {counts[name]:>3} / {budget}")
+    print(f"{len(BUDGETS) - failures} of {len(BUDGETS)} endpoints within budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())